@@ -2,6 +2,8 @@
 import argparse
 import textwrap
 
+from hydrophone.config import settings
+
 def setup_arg_parser():
     """Sets up and parses command-line arguments."""
     ap = argparse.ArgumentParser(
@@ -33,8 +35,13 @@ def setup_arg_parser():
     ap.add_argument("-y", "--yes", action="store_true", help="Assume 'yes' to confirmation")
     ap.add_argument("--debug", action="store_true", help="Print debug info")
     ap.add_argument("--debug-net", action="store_true", help="Print network debug info (implies --debug)")
-    ap.add_argument("--fallback-retries", type=int, default=12, help="Max fallback retries (default: 12)")
-    ap.add_argument("--fallback-wait", type=float, default=5.0, help="Fallback wait time (s) (default: 5.0)")
+    ap.add_argument("--fallback-retries", type=int, default=settings.DEFAULT_FALLBACK_RETRIES, help=f"Max fallback retries (default: {settings.DEFAULT_FALLBACK_RETRIES})")
+    ap.add_argument("--fallback-wait", type=float, default=settings.DEFAULT_FALLBACK_WAIT_SECONDS, help=f"Fallback wait time (s) (default: {settings.DEFAULT_FALLBACK_WAIT_SECONDS})")
+    ap.add_argument("--fallback-workers", type=int, default=settings.DEFAULT_FALLBACK_WORKERS, help=f"Parallel file downloads during fallback (default: {settings.DEFAULT_FALLBACK_WORKERS})")
+    ap.add_argument("--archive-workers", type=int, default=settings.DEFAULT_ARCHIVE_WORKERS, help=f"Parallel archive file downloads (default: {settings.DEFAULT_ARCHIVE_WORKERS})")
+    ap.add_argument("--download-timeout", type=int, default=settings.DEFAULT_SLOW_DOWNLOAD_TIMEOUT, help=f"Request timeout (s) for MAT/PDF product downloads (default: {settings.DEFAULT_SLOW_DOWNLOAD_TIMEOUT})")
     ap.add_argument("--fetch-sensitivity", action="store_true", help="Fetch and save hydrophone sensitivity calibration file(s)")
     ap.add_argument("--zip-output", action="store_true", help="Create a zip file containing all organized data after download")
+    ap.add_argument("--no-cache", action="store_true", help="Ignore cached ONC catalog responses and refetch them")
+    ap.add_argument("--force", action="store_true", help="Redo archive downloads already completed by a previous run into the output directory")
     return ap.parse_args()
\ No newline at end of file
@@ -4,17 +4,18 @@ from typing import List, Union
 
 from hydrophone.utils.exceptions import UserAbortError
 
-def prompt_pick(opts: List[str], title: str, allow_multiple: bool = False) -> Union[int, List[int]]:
+def prompt_pick(opts: List[str], title: str, allow_multiple: bool = False, allow_empty: bool = False) -> Union[int, List[int]]:
     """Prompts the user to pick option(s) from a numbered list.
     
     Args:
         opts: List of options to choose from
         title: Title to display above the options
         allow_multiple: If True, allows selecting multiple options using comma/space separated numbers
+        allow_empty: If True (with allow_multiple), blank input selects nothing and returns []
         
     Returns:
         If allow_multiple=False: A single integer index
-        If allow_multiple=True: A list of integer indices
+        If allow_multiple=True: A list of integer indices (possibly empty if allow_empty=True)
     """
     print(f"\n== {title} ==")
     if not opts:
@@ -27,10 +28,13 @@ def prompt_pick(opts: List[str], title: str, allow_multiple: bool = False) -> Un
     while True:
         try:
             if allow_multiple:
-                choice_str = input(f"Enter number(s) (0 to {len(opts)-1}, separate multiple with comma/space): ")
+                blank_hint = ", blank for none" if allow_empty else ""
+                choice_str = input(f"Enter number(s) (0 to {len(opts)-1}, separate multiple with comma/space{blank_hint}): ")
             else:
                 choice_str = input(f"Enter number (0 to {len(opts)-1}): ")
                 
+            if allow_multiple and allow_empty and not choice_str.strip():
+                return []
             if not choice_str: # Handle empty input
                 print("✖ Please enter number(s).")
                 continue
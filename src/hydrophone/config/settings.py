@@ -1,6 +1,7 @@
 """
 Configuration settings for the hydrophone data retrieval system.
 """
+import os
 
 # Standard ISO format string used by ONC API
 ISO_FMT = "%Y-%m-%dT%H:%M:%S.000Z"
@@ -8,6 +9,16 @@ ISO_FMT = "%Y-%m-%dT%H:%M:%S.000Z"
 # Default ONC API timeout (seconds)
 DEFAULT_ONC_TIMEOUT = 60
 
+# Timeout (seconds) for downloading slow-to-generate MAT/PDF data products (can be overridden by args)
+DEFAULT_SLOW_DOWNLOAD_TIMEOUT = 300
+
+# On-disk cache for rarely-changing ONC catalog responses (e.g. getLocations)
+CACHE_DIR = os.path.join(os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "hydrophone")
+LOCATIONS_CACHE_TTL_SECONDS = 24 * 60 * 60
+ARCHIVE_LISTING_CACHE_TTL_SECONDS = 60 * 60
+# In-process reuse of per-device getDataProducts responses across discovery runs
+DATA_PRODUCTS_CACHE_TTL_SECONDS = 60 * 60
+
 # Default parameters for specific product types
 PNG_DEFAULT_PARAMS = dict(dpo_lowerColourLimit=-1000, dpo_upperColourLimit=-1000)
 
@@ -23,11 +34,21 @@ PNG_DEFAULT_PARAMS = dict(dpo_lowerColourLimit=-1000, dpo_upperColourLimit=-1000
 # PNG: Hydrophone Spectral Data (HSD), Spectral Probability Density (HSPD), Spectrogram (SHV), Time Series Plots
 # TXT: Log File (LF), Time Series Scalar Data (TSSD)
 # Note: WAV/MP3 files are no longer supported by ONC
-SUPPORTED_EXTENSIONS = ("acc", "an", "csv", "fft", "flac", "json", "mat", "pdf", "png", "txt")
+SUPPORTED_EXTENSIONS = frozenset({"acc", "an", "csv", "fft", "flac", "json", "mat", "pdf", "png", "txt"})
 
 # Fallback download settings (can be overridden by args)
 DEFAULT_FALLBACK_RETRIES = 12
 DEFAULT_FALLBACK_WAIT_SECONDS = 5.0
+DEFAULT_FALLBACK_WORKERS = 4
+# Minimum spacing between fallback file download starts, shared across workers (seconds)
+FALLBACK_FILE_INTERVAL_SECONDS = 0.5
+FALLBACK_SLOW_FILE_INTERVAL_SECONDS = 2.0  # MAT/PDF
+
+# Number of archive files downloaded concurrently (can be overridden by args)
+DEFAULT_ARCHIVE_WORKERS = 6
+
+# Maximum number of concurrent requestDataProduct calls when preparing jobs
+DP_REQUEST_MAX_WORKERS = 8
 
 # Data Product Option mappings for different product types and extensions
 # The key is a tuple of (product_code, extension) and the value is a dictionary of DPO parameters
@@ -9,7 +9,7 @@ from pathlib import Path
 import time
 from datetime import datetime, timezone
 from dateutil import parser as dtparse
-from dateutil.tz import gettz, UTC
+from dateutil.tz import UTC
 from onc import ONC
 from typing import List, Optional, Tuple, Dict, Any
 
@@ -43,10 +43,9 @@ class OutputWidgetHandler(logging.Handler):
     def emit(self, record):
         """Overload of logging.Handler method."""
         formatted_record = self.format(record)
-        with self.out:
-            # Append the formatted record to the Output widget
-            # Add newline if not already present
-            print(formatted_record, end='\n' if not formatted_record.endswith('\n') else '')
+        # append_stdout, unlike `with self.out:`, is safe from worker threads
+        # Add newline if not already present
+        self.out.append_stdout(formatted_record if formatted_record.endswith('\n') else formatted_record + '\n')
 
     def handle_error(self, record):
         # Fallback to stderr if there's an error within the handler itself
@@ -155,7 +154,7 @@ def run_download_logic(params: Dict[str, Any], output_widget: Optional['widgets.
                 raise ConfigError("ONC API token required ('token').")
 
             tz_str = params.get('tz', 'America/Vancouver')
-            local_zone = gettz(tz_str)
+            local_zone = utils.get_zone(tz_str)
             if local_zone is None:
                 raise ConfigError(f"Invalid timezone '{tz_str}'.")
             logging.info(f"Using local timezone: {tz_str}")
@@ -196,7 +195,9 @@ def run_download_logic(params: Dict[str, Any], output_widget: Optional['widgets.
                 showInfo=params.get('debug_net', False),
                 timeout=settings.DEFAULT_ONC_TIMEOUT
             )
-            onc_service.getLocations({})
+            # Warms the locations cache used during discovery. A fresh catalog fetch also
+            # validates the token; with a cached catalog, getDevices does that instead.
+            onc._cached_get_locations(onc_service, use_disk_cache=not params.get('no_cache', False))
             utils.dbg_param("ONC client initialized successfully.", debug_on=params.get('debug', False))
 
             # 2. Discover Deployments & Products
@@ -309,7 +310,7 @@ def run_downloader() -> int:
     # For CLI, ensure dates are parsed if provided
     if args.start and args.end:
         try:
-            local_zone = gettz(args.tz)
+            local_zone = utils.get_zone(args.tz)
             if local_zone is None:
                 raise ValueError(f"Invalid timezone '{args.tz}'")
             params['start_str'] = args.start
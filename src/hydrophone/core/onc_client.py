@@ -1,17 +1,26 @@
 """
 ONC API client module for hydrophone data retrieval
 """
+import concurrent.futures
+import hashlib
+import heapq
+import importlib
+import json
 import logging
+import os
+import random
 import re
 import time
 from datetime import datetime, timezone
-from collections import defaultdict
-from typing import Dict, List, Tuple, Any, Optional, Union
+from collections import Counter, defaultdict
+from typing import Dict, List, NamedTuple, Tuple, Any, Callable, Optional, Union
 from pathlib import Path
 import pprint
 import requests
+from urllib3.util.retry import Retry
 import zipfile
 import shutil # Added for rmtree
+import threading
 try:
     from dateutil import parser as dtparse
     from dateutil.tz import gettz, UTC
@@ -38,16 +47,222 @@ except AttributeError as ae:
 
 from hydrophone.utils import helpers as utils
 from hydrophone.cli import ui
-from hydrophone.config.settings import PNG_DEFAULT_PARAMS, SUPPORTED_EXTENSIONS, DPO_MAPPINGS
+from hydrophone.config.settings import (
+    PNG_DEFAULT_PARAMS, SUPPORTED_EXTENSIONS, DPO_MAPPINGS,
+    CACHE_DIR, LOCATIONS_CACHE_TTL_SECONDS, ARCHIVE_LISTING_CACHE_TTL_SECONDS, DP_REQUEST_MAX_WORKERS,
+    DEFAULT_FALLBACK_WORKERS, DEFAULT_ARCHIVE_WORKERS, DEFAULT_SLOW_DOWNLOAD_TIMEOUT,
+    FALLBACK_FILE_INTERVAL_SECONDS, FALLBACK_SLOW_FILE_INTERVAL_SECONDS
+)
 from hydrophone.utils.exceptions import ONCInteractionError, NoDataError, DownloadError
 
+# --- Connection Pooling ---
+
+class _PooledRequests:
+    """
+    Stand-in for the `requests` module inside onc-python's modules.
+    The ONC client calls module-level requests.get/head (a new TCP/TLS connection
+    per call); this routes those through one keep-alive Session instead.
+    """
+    def __init__(self, session: requests.Session):
+        self._session = session
+
+    def get(self, url, params=None, **kwargs):
+        return self._session.get(url, params=params, **kwargs)
+
+    def head(self, url, **kwargs):
+        return self._session.head(url, **kwargs)
+
+    def __getattr__(self, name):
+        # Exceptions and anything else still come from the real module
+        return getattr(requests, name)
+
+
+def _create_session() -> requests.Session:
+    """Creates the shared Session, sized for the parallel request/download pools."""
+    session = requests.Session()
+    # Transparently retry transient gateway errors (idempotent GET/HEAD only); after the
+    # last attempt the response is handed back so onc-python's own error handling applies.
+    # Read errors are re-raised unretried (read=False keeps them requests.ReadTimeout etc.): the
+    # download timeouts and retry loops below own those.
+    retries = Retry(total=3, read=False, backoff_factor=0.5, status_forcelist=(502, 503, 504), raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(pool_connections=16, pool_maxsize=32, max_retries=retries)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+SESSION = _create_session()
+
+
+def _install_pooled_session(session: requests.Session) -> None:
+    """Points the onc-python modules that perform HTTP calls at the shared session."""
+    pooled = _PooledRequests(session)
+    for module_name in ("_OncService", "_OncDelivery", "_OncArchive", "_DataProductFile"):
+        try:
+            module = importlib.import_module(f"onc.modules.{module_name}")
+        except ImportError:
+            logging.debug(f"onc.modules.{module_name} not found; leaving its HTTP calls unpooled.")
+            continue
+        if getattr(module, "requests", None) is requests:
+            module.requests = pooled
+
+
+_install_pooled_session(SESSION)
+
+# Data product extensions that are slow to generate server-side (longer waits/timeouts)
+_SLOW_EXTS = frozenset({'mat', 'pdf'})
+
 # --- Discovery Functions ---
 
+def _token_digest(token: Optional[str]) -> str:
+    """Identifies an API token in cache file names and contents without storing the token itself."""
+    return hashlib.sha256((token or "").encode()).hexdigest()[:16]
+
+
+def _read_cache_file(cache_file: Path, base_url: str, token_digest: str, ttl_seconds: float) -> Optional[Any]:
+    """
+    Returns the data stored in a JSON cache file if it was written for base_url and
+    the same token (by digest) and is younger than ttl_seconds.
+    """
+    try:
+        cached = json.loads(cache_file.read_text())
+        if (cached.get('baseUrl') == base_url and cached.get('tokenDigest') == token_digest
+                and time.time() - cached.get('timestamp', 0) < ttl_seconds):
+            logging.debug(f"Using cached ONC response from {cache_file}")
+            return cached['data']
+    except (OSError, ValueError, KeyError, AttributeError):
+        pass # Missing or unreadable cache, caller fetches
+    return None
+
+
+def _write_cache_file(cache_file: Path, base_url: str, token_digest: str, data: Any) -> None:
+    """Atomically writes data to a JSON cache file; failures are only logged."""
+    try:
+        cache_file.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = cache_file.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_file.write_text(json.dumps({
+            'timestamp': time.time(),
+            'baseUrl': base_url,
+            'tokenDigest': token_digest,
+            'data': data
+        }))
+        os.replace(tmp_file, cache_file)
+    except OSError as e:
+        logging.debug(f"Could not write cache file {cache_file}: {e}")
+
+
+# In-process cache of getLocations results, keyed by (baseUrl, token)
+_LOCATIONS_CACHE: Dict[Tuple[str, str], List[Dict]] = {}
+
+def _cached_get_locations(onc_client: ONC, use_disk_cache: bool = True) -> List[Dict]:
+    """
+    Returns onc_client.getLocations({}), reusing a previous result when possible.
+
+    Results are kept in memory for the lifetime of the process and, unless
+    use_disk_cache is False, in a JSON file under CACHE_DIR that is reused for
+    LOCATIONS_CACHE_TTL_SECONDS. The cache file is keyed on (and checked against)
+    a digest of the token, so different accounts never share cached catalogs.
+    """
+    token = onc_client.token or ""
+    key = (onc_client.baseUrl, token)
+    if key in _LOCATIONS_CACHE:
+        return _LOCATIONS_CACHE[key]
+
+    token_digest = _token_digest(token)
+    cache_file = Path(CACHE_DIR) / f"locations_{token_digest}.json"
+    if use_disk_cache:
+        cached = _read_cache_file(cache_file, onc_client.baseUrl, token_digest, LOCATIONS_CACHE_TTL_SECONDS)
+        if cached is not None:
+            _LOCATIONS_CACHE[key] = cached
+            return cached
+
+    locations = onc_client.getLocations({})
+    if not isinstance(locations, list):
+        return locations
+    _LOCATIONS_CACHE[key] = locations
+    _write_cache_file(cache_file, onc_client.baseUrl, token_digest, locations)
+    return locations
+
+
+def _cached_get_archivefile(onc_client: ONC, filters: Dict, use_disk_cache: bool = True) -> Dict:
+    """
+    Returns onc_client.getArchivefile(filters=filters, allPages=True), reusing a
+    listing saved under CACHE_DIR within ARCHIVE_LISTING_CACHE_TTL_SECONDS.
+    Listings are paginated server-side, so a rerun of the same request skips the crawl.
+    """
+    filters_key = hashlib.sha1(json.dumps(filters, sort_keys=True, default=str).encode()).hexdigest()
+    token_digest = _token_digest(onc_client.token)
+    cache_file = Path(CACHE_DIR) / f"archivefiles_{token_digest}_{filters_key}.json"
+    if use_disk_cache:
+        cached = _read_cache_file(cache_file, onc_client.baseUrl, token_digest, ARCHIVE_LISTING_CACHE_TTL_SECONDS)
+        if cached is not None:
+            return cached
+
+    list_result = onc_client.getArchivefile(filters=filters, allPages=True)
+    if isinstance(list_result, dict):
+        _write_cache_file(cache_file, onc_client.baseUrl, token_digest, list_result)
+    return list_result
+
+
+def _is_onc_timestamp(s: Any) -> bool:
+    """True if s has the canonical ONC layout 'YYYY-MM-DDTHH:MM:SS.fffZ'."""
+    return isinstance(s, str) and len(s) == 24 and s[10] == 'T' and s[19] == '.' and s[23] == 'Z'
+
+def _onc_timestamp_key(dt: datetime) -> str:
+    """Formats an aware datetime in the canonical ONC layout (millisecond precision)."""
+    dt = dt.astimezone(timezone.utc)
+    return f"{dt.strftime('%Y-%m-%dT%H:%M:%S')}.{dt.microsecond // 1000:03d}Z"
+
+def _filter_overlapping_deployments(
+    deployments: List[Dict],
+    start_utc: datetime,
+    end_utc: datetime,
+    debug: bool = False
+) -> List[Dict]:
+    """
+    Returns the deployments whose [begin, end] interval overlaps [start_utc, end_utc],
+    preserving input order. A missing 'end' means the deployment is still active.
+    """
+    # ONC timestamps share one fixed-width UTC layout, so they order lexicographically.
+    # Compare those as strings and only parse rows in any other format.
+    start_key = _onc_timestamp_key(start_utc)
+    end_key = _onc_timestamp_key(end_utc)
+    overlapping = []
+    for dep in deployments:
+        begin_str = dep.get('begin')
+        end_str = dep.get('end')
+        if not begin_str:
+            if debug:
+                logging.warning("Skipping deployment with no begin date: %s", dep.get('deviceCode', '?'))
+            continue
+        if _is_onc_timestamp(begin_str) and (not end_str or _is_onc_timestamp(end_str)):
+            if begin_str <= end_key and (not end_str or end_str >= start_key):
+                overlapping.append(dep)
+            continue
+        try:
+            begin = utils.parse_datetime(begin_str)
+            end = utils.parse_datetime(end_str) if end_str else None
+            # ONC reports UTC; treat naive values as UTC. Aware values compare
+            # correctly as-is, so no astimezone() conversion is needed.
+            if begin.tzinfo is None:
+                begin = begin.replace(tzinfo=timezone.utc)
+            if end is not None and end.tzinfo is None:
+                end = end.replace(tzinfo=timezone.utc)
+
+            # Check if deployment overlaps with requested time range
+            if (begin <= end_utc) and (not end or end >= start_utc):
+                overlapping.append(dep)
+        except (ValueError, TypeError, OverflowError) as e: # ParserError is a ValueError
+            if debug:
+                logging.warning("Skipping deployment with invalid dates: %s", e)
+    return overlapping
+
 def find_overlapping_deployments(
     onc_client: ONC,
     start_utc: datetime,
     end_utc: datetime,
-    args: Any
+    args: Any,
+    progress_write: Optional[Callable[[str], None]] = None
 ) -> Tuple[List[Dict], Dict[str, str]]:
     """
     Find hydrophone deployments that overlap with the specified time range.
@@ -57,6 +272,7 @@ def find_overlapping_deployments(
         start_utc: Start time in UTC
         end_utc: End time in UTC
         args: Arguments object with debug and archive flags
+        progress_write: Where the deployment-fetch progress line goes (default: sys.stdout)
     
     Returns:
         Tuple of (list of deployments, location map)
@@ -64,9 +280,9 @@ def find_overlapping_deployments(
     logging.info("Finding hydrophone locations and devices...")
     
     # Get location map first (needed for display names)
-    loc_response = onc_client.getLocations({})
-    loc_map = {loc.get('locationCode'): loc.get('locationName', '') 
-               for loc in loc_response if isinstance(loc, dict)}
+    loc_response = _cached_get_locations(onc_client, use_disk_cache=not getattr(args, 'no_cache', False))
+    loc_map = {loc['locationCode']: loc.get('locationName', '')
+               for loc in loc_response if 'locationCode' in loc}
     
     # Get all hydrophones
     logging.info("Getting hydrophone device list...")
@@ -85,7 +301,8 @@ def find_overlapping_deployments(
         onc_client,
         all_hydrophones,
         max_workers=10,
-        debug=args.debug
+        debug=args.debug,
+        write=progress_write
     )
     
     if not all_deployments:
@@ -94,19 +311,7 @@ def find_overlapping_deployments(
     logging.info(f"Found {len(all_deployments)} total deployment(s).")
     
     # Filter deployments by time overlap
-    overlapping = []
-    for dep in all_deployments:
-        try:
-            begin = utils.parse_datetime(dep.get('begin'))
-            end = utils.parse_datetime(dep.get('end')) if dep.get('end') else None
-            
-            # Check if deployment overlaps with requested time range
-            if (begin <= end_utc) and (not end or end >= start_utc):
-                overlapping.append(dep)
-        except Exception as e:
-            if args.debug:
-                logging.warning(f"Skipping deployment with invalid dates: {e}")
-            continue
+    overlapping = _filter_overlapping_deployments(all_deployments, start_utc, end_utc, debug=args.debug)
     
     if not overlapping:
         raise NoDataError("No overlapping hydrophone deployments found for the specified time range.")
@@ -131,39 +336,37 @@ def find_overlapping_deployments(
     return filtered_deployments, loc_map
 
 
+_CITATION_NAME_RE = re.compile(r'\.\s*\d{4}\.\s*(.*?)(?:\s+Hydrophone)?\s+Deployed\s+\d{4}-\d{2}-\d{2}', re.IGNORECASE)
+_CITATION_SIMPLE_RE = re.compile(r'\.\s*\d{4}\.\s*(.*)')
+_CITATION_CLEANUP_RE = re.compile(
+    r'(?:\d{4}-\d{2}-\d{2}|https?://doi\.org|\s+(?:Hydrophone\s+)?Deployed).*$',
+    re.IGNORECASE | re.DOTALL
+)
+
 def _extract_name_from_citation(citation_string: Optional[str]) -> Optional[str]:
     """Attempts to extract a location name from the citation string."""
-    if not citation_string:
+    # Both patterns below need a ". YYYY." marker, so skip the regex engine without one
+    if not citation_string or "." not in citation_string:
         return None
 
     # Try to find patterns like "... YYYY. [Location Name] Hydrophone Deployed YYYY-MM-DD..."
     # Or "... YYYY. [Location Name] Deployed YYYY-MM-DD..."
     # Make it non-greedy and look for "Deployed YYYY-MM-DD" as an end marker
-    match = re.search(r'\.\s*\d{4}\.\s*(.*?)(?:\s+Hydrophone)?\s+Deployed\s+\d{4}-\d{2}-\d{2}', citation_string, re.IGNORECASE)
-
-    if match:
-        potential_name = match.group(1).strip()
-        # Avoid overly generic terms if possible, though might be hard
-        if potential_name and potential_name.lower() not in ["hydrophone", "underwater network"]:
-             # Simple cleanup: remove trailing punctuation if any
-             potential_name = potential_name.rstrip('.,;:!?)(')
-             return potential_name
+    if "deployed" in citation_string.lower():
+        match = _CITATION_NAME_RE.search(citation_string)
+        if match:
+            potential_name = match.group(1).strip()
+            # Avoid overly generic terms if possible, though might be hard
+            if potential_name and potential_name.lower() not in ["hydrophone", "underwater network"]:
+                 # Simple cleanup: remove trailing punctuation if any
+                 potential_name = potential_name.rstrip('.,;:!?)(')
+                 return potential_name
 
     # Fallback: Simpler pattern if the above fails - just take text after year dot
-    match_simple = re.search(r'\.\s*\d{4}\.\s*(.*)', citation_string)
+    match_simple = _CITATION_SIMPLE_RE.search(citation_string)
     if match_simple:
-         potential_name = match_simple.group(1).strip()
-         # Crude check to remove trailing date/doi parts if they exist
-         date_match = re.search(r'\d{4}-\d{2}-\d{2}', potential_name)
-         if date_match:
-              potential_name = potential_name[:date_match.start()].strip()
-         doi_match = re.search(r'https?://doi.org', potential_name, re.IGNORECASE)
-         if doi_match:
-             potential_name = potential_name[:doi_match.start()].strip()
-
-         # Remove trailing hydrophone/deployment info if present
-         potential_name = re.sub(r'\s+Hydrophone\s+Deployed.*$', '', potential_name, flags=re.IGNORECASE).strip()
-         potential_name = re.sub(r'\s+Deployed.*$', '', potential_name, flags=re.IGNORECASE).strip()
+         # Crude cleanup: cut at the first trailing date, DOI link or "(Hydrophone) Deployed" part
+         potential_name = _CITATION_CLEANUP_RE.sub('', match_simple.group(1)).strip()
          potential_name = potential_name.rstrip('.,;:!?)(')
 
          if potential_name and potential_name.lower() not in ["hydrophone", "underwater network"]:
@@ -180,27 +383,27 @@ def select_location_and_devices(
     """Prompts user to select a parent location, shows all hydrophone codes at that location,
        then prompts for specific hydrophone(s)."""
 
-    # --- Group deployments by PARENT location code ---
+    # --- Group deployments (and their device codes) by PARENT location code ---
     by_parent_loc = defaultdict(list)
-    parent_codes_found = set()
+    device_codes_by_parent = defaultdict(set)
 
     for d in deployments:
         loc_code_from_dep = d.get('locationCode')
         if not loc_code_from_dep:
             continue
 
-        parent_code = loc_code_from_dep
-        if '.' in loc_code_from_dep:
-            parent_code = loc_code_from_dep.split('.')[0]
+        parent_code = loc_code_from_dep.partition('.')[0]
 
         by_parent_loc[parent_code].append(d)
-        parent_codes_found.add(parent_code)
+        device_code = d.get('deviceCode')
+        if device_code:
+            device_codes_by_parent[parent_code].add(device_code)
     # --- End Grouping ---
 
     if not by_parent_loc:
         raise NoDataError("No deployments found with processable location codes.")
 
-    sorted_parent_codes = sorted(list(parent_codes_found))
+    sorted_parent_codes = sorted(by_parent_loc)
 
     # --- Build PARENT Location Choices with Associated Device Codes ---
     parent_loc_choices = []
@@ -212,66 +415,27 @@ def select_location_and_devices(
 
     print("\n--- Determining Parent Locations and Associated Hydrophones ---")
     for parent_code in sorted_parent_codes:
-        # print(f"\nProcessing Parent Code: '{parent_code}'") # Optional debug
-        display_name = None
-        source_of_name = "Unknown"
         deployments_at_parent = by_parent_loc[parent_code]
         first_deployment = deployments_at_parent[0] if deployments_at_parent else None
 
         # --- Naming Logic ---
-        # 1. Get name from loc_map
+        # Prefer a non-generic loc_map name, then a name parsed from the first
+        # deployment's citation, then the generic map name, then the code itself.
         parent_map_name = loc_map.get(parent_code)
-        is_generic_from_map = False
-        if parent_map_name:
-             if parent_map_name in GENERIC_LOC_MAP_NAMES:
-                 is_generic_from_map = True
-                 # print(f"  -> Name Source: Direct Lookup (loc_map['{parent_code}']) -> '{parent_map_name}' (Generic)") # Optional debug
-             else:
-                 # Use the map name if it exists and is NOT generic
-                 display_name = parent_map_name
-                 source_of_name = f"Direct Lookup (loc_map['{parent_code}'])"
-                 # print(f"  -> Name Source: {source_of_name} -> '{display_name}'") # Optional debug
-        # else:
-             # print(f"  -> Name Source: Direct Lookup (loc_map['{parent_code}']) FAILED") # Optional debug
-
-
-        # 2. Try citation parsing ONLY IF map lookup failed OR gave a generic name.
-        if display_name is None: # This means map lookup failed OR was generic
-            if first_deployment:
-                citation_text = first_deployment.get('citation', {}).get('citation')
-                citation_name = _extract_name_from_citation(citation_text)
-                if citation_name:
-                    display_name = citation_name # Use citation name
-                    source_of_name = "Citation Parse"
-                    # print(f"  -> Name Source: {source_of_name} -> '{display_name}'") # Optional debug
-                # else:
-                    # print(f"  -> Name Source: Citation Parse FAILED") # Optional debug
-
-        # 3. Fallback: If we STILL don't have a name...
-        if display_name is None:
-            # Use the generic map name if we had one originally
-            if parent_map_name and is_generic_from_map:
-                display_name = parent_map_name
-                source_of_name = "Generic Map Fallback"
-                # print(f"  -> Name Source: {source_of_name} -> '{display_name}'") # Optional debug
-            # Otherwise, use the code itself
-            else:
-                display_name = parent_code
-                source_of_name = "Code Fallback"
-                # print(f"  -> Name Source: {source_of_name} -> '{display_name}'") # Optional debug
+        display_name = None if parent_map_name in GENERIC_LOC_MAP_NAMES else parent_map_name
+        if not display_name and first_deployment:
+            citation_text = (first_deployment.get('citation') or {}).get('citation')
+            display_name = _extract_name_from_citation(citation_text)
+        display_name = display_name or parent_map_name or parent_code
         # --- End Naming Logic ---
 
 
         # --- Get Device List (Codes Only) ---
-        device_codes_only = set()
-        for dep in deployments_at_parent:
-            device_code = dep.get('deviceCode')
-            if device_code:
-                device_codes_only.add(device_code)
+        device_codes_only = device_codes_by_parent[parent_code]
 
         device_list_str = ""
         if device_codes_only:
-            sorted_codes = sorted(list(device_codes_only))
+            sorted_codes = sorted(device_codes_only)
             device_list_str = f" (Hydrophones: {'; '.join(sorted_codes)})"
             # print(f"  -> Devices Found:{device_list_str}") # Optional debug
         # else:
@@ -309,9 +473,8 @@ def select_location_and_devices(
     devices_at_selected_parent = {} # {deviceCode: deviceName}
     for dep in deployments_for_selected_parent:
         d_code = dep.get('deviceCode')
-        d_name = dep.get('deviceName', 'Unknown Device')
         if d_code and d_code not in devices_at_selected_parent:
-             devices_at_selected_parent[d_code] = d_name
+             devices_at_selected_parent[d_code] = dep.get('deviceName', 'Unknown Device')
 
     # === Second Prompt: Select Specific Hydrophone(s) ===
     hydrophone_menu = ["ALL Hydrophones at this location"]
@@ -367,7 +530,7 @@ def select_data_products(
 
     try:
         # Get actual data products first
-        prod_opts = onc_client.getDataProducts({"deviceCode": first_device_code})
+        prod_opts = utils.get_data_products(onc_client, first_device_code)
         if not isinstance(prod_opts, list): prod_opts = []
         utils.dbg("Available data products response", prod_opts, args=args)
 
@@ -494,6 +657,25 @@ def select_data_products(
 
 # --- Job Request & Download Functions ---
 
+_PNG_THUMB_SUFFIXES = ('-small.png', '-thumb.png')
+
+def _is_png_thumbnail(filename_lower: str) -> bool:
+    """True for the '-small.png' / '-thumb.png' preview variants ONC lists next to full PNGs."""
+    return filename_lower.endswith(_PNG_THUMB_SUFFIXES)
+
+
+# ONC 400 errors that mean "skip this product" rather than a real failure
+# (API error 71: permissions not granted, 141: missing/invalid DPO for the product)
+_API_SKIP_RE = re.compile(r'api error (?:71|141)|permissions not granted', re.IGNORECASE)
+
+class Job(NamedTuple):
+    """A prepared download job, as produced by request_onc_jobs."""
+    kind: str        # 'dataproduct' or 'archive'
+    payload: Any     # dpRequestId for data products, getArchivefile filters for archives
+    device_code: str
+    ext: str
+
+
 def request_onc_jobs(
     onc_client: ONC,
     chosen_deps: List[Dict],
@@ -501,7 +683,7 @@ def request_onc_jobs(
     start_utc: datetime,
     end_utc: datetime,
     args: Any # Should now behave like an object with attributes from params dict
-) -> Tuple[List[Tuple[str, Any, str, str]], int]:
+) -> Tuple[List[Job], int]:
     """
     Requests data product or prepares archive download jobs from ONC.
     Bypasses interactive archive listing/prompting if 'selected_archive_extensions'
@@ -510,22 +692,26 @@ def request_onc_jobs(
     logging.info("Requesting data products or preparing archive downloads...")
     total_bytes_est = 0
     jobs = []
+    dp_requests = [] # (device_code, ext, product_code, filters) for data product mode
     is_archive_mode = getattr(args, 'archive', False)
     is_test_mode = getattr(args, 'test', False)
     ui_selected_archive_exts = getattr(args, 'selected_archive_extensions', None)
+    # The time window is the same for every job, so format it once
+    date_from = utils.iso(start_utc)
+    date_to = utils.iso(end_utc)
 
     for dep in chosen_deps:
-        device_code = dep.get("deviceCode")
+        device_code, device_name = dep.get("deviceCode"), dep.get("deviceName", "?")
         if not device_code:
-            logging.warning(f"Skipping deployment with missing device code: {dep.get('deviceName','?')}")
+            logging.warning("Skipping deployment with missing device code: %s", device_name)
             continue
 
-        logging.info(f"--- Preparing requests for Device: {device_code} ({dep.get('deviceName','?')}) ---")
+        logging.info("--- Preparing requests for Device: %s (%s) ---", device_code, device_name)
 
         if is_archive_mode:
             if ui_selected_archive_exts is not None:
                 # UI provided selections - bypass listing and prompting
-                logging.info(f"Archive mode: Using pre-selected extensions from UI: {ui_selected_archive_exts}")
+                logging.info("Archive mode: Using pre-selected extensions from UI: %s", ui_selected_archive_exts)
                 if not ui_selected_archive_exts:
                     logging.warning("UI provided empty selection list for archive mode. No jobs created.")
                     continue
@@ -534,27 +720,27 @@ def request_onc_jobs(
                 for ext in ui_selected_archive_exts:
                     archive_filters_ext = dict(
                         deviceCode=device_code,
-                        dateFrom=utils.iso(start_utc),
-                        dateTo=utils.iso(end_utc),
+                        dateFrom=date_from,
+                        dateTo=date_to,
                         extension=ext.lower(), # Ensure lowercase
                         returnOptions='all'
                     )
-                    jobs.append(('archive', archive_filters_ext, device_code, ext))
-                    logging.info(f"  Prepared archive job for extension: {ext}")
+                    jobs.append(Job('archive', archive_filters_ext, device_code, ext))
+                    logging.info("  Prepared archive job for extension: %s", ext)
                 continue # Skip the rest of the loop for this deployment
 
             # Original CLI interactive logic for archive/test mode
             logging.info(f"Archive/Test mode: Listing all available files interactively...")
             archive_filters = dict(
                 deviceCode=device_code,
-                dateFrom=utils.iso(start_utc),
-                dateTo=utils.iso(end_utc),
+                dateFrom=date_from,
+                dateTo=date_to,
                 returnOptions='all'
             )
             utils.dbg("Archive Request Filters (Interactive):", archive_filters, args=args)
 
             try:
-                list_result = onc_client.getArchivefile(filters=archive_filters, allPages=True)
+                list_result = _cached_get_archivefile(onc_client, archive_filters, use_disk_cache=not getattr(args, 'no_cache', False))
                 potential_files = list_result.get("files", [])
                 files_found = len(potential_files)
                 logging.info(f"Found {files_found} {'file' if files_found == 1 else 'files'}.")
@@ -566,11 +752,11 @@ def request_onc_jobs(
                         if not isinstance(file_info, dict): continue
                         filename = file_info.get('filename')
                         if not filename: continue
-                        is_png = '.png' in filename.lower()
-                        is_thumb_small = is_png and ('-small.png' in filename.lower() or '-thumb.png' in filename.lower())
-                        if is_thumb_small: continue
+                        filename_lower = filename.lower()
+                        if _is_png_thumbnail(filename_lower): continue
                         file_size = file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
-                        ext = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
+                        _, dot, ext = filename_lower.rpartition('.')
+                        ext = ext if dot else 'unknown'
                         files_by_ext[ext]['count'] += 1
                         files_by_ext[ext]['size'] += file_size
                         total_size += file_size
@@ -578,11 +764,11 @@ def request_onc_jobs(
                     # Display summary (similar to UI build but for console)
                     print("\nAvailable file types:")
                     print("-" * 60)
-                    ext_sizes = {}
-                    for ext in sorted(files_by_ext.keys()):
-                        info = files_by_ext[ext]
-                        print(f"  {ext.upper()} Files ({info['count']}, {utils.human_size(info['size'])})")
-                        ext_sizes[ext] = info['size']
+                    # Sort and format each extension once; reused by the prompt below
+                    ext_items = sorted(files_by_ext.items())
+                    ext_labels = [f"{ext.upper()} Files ({info['count']} files, {utils.human_size(info['size'])})" for ext, info in ext_items]
+                    for label in ext_labels:
+                        print(f"  {label}")
                     print("-" * 60)
                     print(f"Total size of all files: {utils.human_size(total_size)}")
                     print("-" * 60)
@@ -591,100 +777,98 @@ def request_onc_jobs(
                         logging.info("Test mode enabled. Skipping download prompt.")
                         continue
 
-                    # Prompt user which types to download (CLI ONLY)
-                    print("\nSelect file types to download:")
-                    wanted_exts = []
-                    try:
-                        for ext in sorted(files_by_ext.keys()):
-                            info = files_by_ext[ext]
-                            ans = input(f"Download {ext.upper()} files? ({info['count']} files, {utils.human_size(info['size'])}) [y/N] ").lower()
-                            if ans == 'y':
-                                wanted_exts.append(ext)
-                    except (EOFError, KeyboardInterrupt):
-                        raise ui.UserAbortError("User aborted.")
+                    # Prompt user which types to download in one multi-select (CLI ONLY)
+                    picked = ui.prompt_pick(ext_labels, "Select file types to download", allow_multiple=True, allow_empty=True)
+                    wanted_exts = [ext_items[i] for i in picked]
 
                     if not wanted_exts:
                         logging.warning("No file types selected for download.")
                         continue
 
                     # Create archive jobs for selected extensions
-                    for ext in wanted_exts:
-                        archive_filters_ext = archive_filters.copy()
-                        archive_filters_ext['extension'] = ext
-                        jobs.append(('archive', archive_filters_ext, device_code, ext))
-                        total_bytes_est += ext_sizes[ext]
+                    for ext, info in wanted_exts:
+                        archive_filters_ext = {**archive_filters, 'extension': ext}
+                        jobs.append(Job('archive', archive_filters_ext, device_code, ext))
+                        total_bytes_est += info['size']
 
             except Exception as e:
                 logging.error(f"Error listing/processing archive files interactively: {e}", exc_info=args.debug)
                 raise ONCInteractionError(f"Failed to list/process archive files interactively: {e}") from e
 
         else:
-            # Data Product Mode Logic
+            # Data Product Mode Logic: build the filters here, submit them all at once below
             for ext, prod_info in chosen_products.items():
                 if ext == 'flac': continue # Should not happen if is_archive is False
                 products_to_request = prod_info if isinstance(prod_info, list) else [prod_info]
+                ext_lower, ext_upper = ext.lower(), ext.upper() # Invariant across this extension's products
 
                 for product in products_to_request:
-                    try:
-                        product_code = product.get('dataProductCode')
-                        if not product_code:
-                            logging.warning(f"Skipping product with missing code for ext '{ext}'")
-                            continue
-
-                        logging.info(f"Preparing {ext.upper()} data product request for {product_code}...")
-                        dp_filters = dict(
-                            deviceCode=device_code,
-                            dateFrom=utils.iso(start_utc),
-                            dateTo=utils.iso(end_utc),
-                            dataProductCode=product_code,
-                            extension=ext,
-                            method='request'
-                        )
-
-                        dpo_key = (product_code, ext.lower())
-                        if dpo_key in DPO_MAPPINGS:
-                            dp_filters.update(DPO_MAPPINGS[dpo_key])
-                            utils.dbg(f"Applied DPO mapping for {dpo_key}", DPO_MAPPINGS[dpo_key], args=args)
+                    product_code = product.get('dataProductCode')
+                    if not product_code:
+                        logging.warning("Skipping product with missing code for ext '%s'", ext)
+                        continue
+
+                    logging.info("Preparing %s data product request for %s...", ext_upper, product_code)
+                    dp_filters = dict(
+                        deviceCode=device_code,
+                        dateFrom=date_from,
+                        dateTo=date_to,
+                        dataProductCode=product_code,
+                        extension=ext,
+                        method='request'
+                    )
+
+                    dpo_key = (product_code, ext_lower)
+                    dpo_params = DPO_MAPPINGS.get(dpo_key)
+                    if dpo_params is not None:
+                        dp_filters.update(dpo_params)
+                        utils.dbg(f"Applied DPO mapping for {dpo_key}", dpo_params, args=args)
+                    else:
+                        logging.warning("No DPO mapping found for product %s with extension %s", product_code, ext)
+
+                    utils.dbg(f"{ext_upper} DP Request Filters:", dp_filters, args=args)
+                    dp_requests.append((device_code, ext, product_code, dp_filters))
+
+    if dp_requests:
+        # requestDataProduct is a pure network round trip, so issue the requests concurrently.
+        # Results are consumed in submission order to keep the job list deterministic.
+        logging.info("Submitting %d data product request(s)...", len(dp_requests))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(DP_REQUEST_MAX_WORKERS, len(dp_requests))) as executor:
+            futures = [
+                (executor.submit(
+                    utils.retry_request,
+                    onc_client.requestDataProduct,
+                    filters=dp_filters,
+                    max_retries=3,
+                    initial_wait=2
+                ), device_code, ext, product_code)
+                for device_code, ext, product_code, dp_filters in dp_requests
+            ]
+
+            for future, device_code, ext, product_code in futures:
+                try:
+                    request_result = future.result()
+
+                    if isinstance(request_result, dict):
+                        request_id = request_result.get('dpRequestId')
+                        if request_id:
+                            jobs.append(Job('dataproduct', request_id, device_code, ext))
+                            est_size = utils.extract_bytes_from_response(request_result)
+                            total_bytes_est += est_size
+                            size_display = utils.human_size(est_size) if est_size > 0 else "unknown size"
+                            logging.info(f"  {ext.upper()} request prepared ({product_code}, {device_code}). Est: {size_display}")
                         else:
-                            logging.warning(f"No DPO mapping found for product {product_code} with extension {ext}")
-
-                        utils.dbg(f"{ext.upper()} DP Request Filters:", dp_filters, args=args)
-
-                        try:
-                            request_result = utils.retry_request(
-                                onc_client.requestDataProduct,
-                                filters=dp_filters,
-                                max_retries=3,
-                                initial_wait=2
-                            )
-
-                            if isinstance(request_result, dict):
-                                request_id = request_result.get('dpRequestId')
-                                if request_id:
-                                    jobs.append(('dataproduct', request_id, device_code, ext))
-                                    est_size = utils.extract_bytes_from_response(request_result)
-                                    total_bytes_est += est_size
-                                    size_display = utils.human_size(est_size) if est_size > 0 else "unknown size"
-                                    logging.info(f"  {ext.upper()} request prepared ({product_code}). Est: {size_display}")
-                                else:
-                                    logging.warning(f"No request ID returned for {ext.upper()} product {product_code}. Skipping.")
-                            else:
-                                logging.warning(f"Unexpected response type ({type(request_result)}) for {ext.upper()} product {product_code}. Skipping.")
+                            logging.warning(f"No request ID returned for {ext.upper()} product {product_code}. Skipping.")
+                    else:
+                        logging.warning(f"Unexpected response type ({type(request_result)}) for {ext.upper()} product {product_code}. Skipping.")
 
-                        except requests.exceptions.HTTPError as http_err:
-                            err_text = str(http_err).lower()
-                            if http_err.response is not None and http_err.response.status_code == 400 and ("api error 71" in err_text or "permissions not granted" in err_text or "api error 141" in err_text):
-                                logging.warning(f"⚠ Skipping request for {product_code} ({ext}) due to API error (e.g., permissions, missing DPO): {http_err}")
-                            else:
-                                logging.error(f"✖ HTTP error requesting {ext.upper()} product {product_code}: {http_err}", exc_info=args.debug)
-                            continue
-                        except Exception as e:
-                            logging.error(f"✖ Error requesting {ext.upper()} product {product_code}: {e}", exc_info=args.debug)
-                            continue
-
-                    except Exception as outer_e:
-                        logging.error(f"✖ Unexpected error preparing {ext.upper()} product {product_code}: {outer_e}", exc_info=args.debug)
-                        continue
+                except requests.exceptions.HTTPError as http_err:
+                    if http_err.response is not None and http_err.response.status_code == 400 and _API_SKIP_RE.search(str(http_err)):
+                        logging.warning(f"⚠ Skipping request for {product_code} ({ext}) due to API error (e.g., permissions, missing DPO): {http_err}")
+                    else:
+                        logging.error(f"✖ HTTP error requesting {ext.upper()} product {product_code}: {http_err}", exc_info=args.debug)
+                except Exception as e:
+                    logging.error(f"✖ Error requesting {ext.upper()} product {product_code}: {e}", exc_info=args.debug)
 
     if not jobs:
         # Raise NoDataError only if the *initial* parameters didn't lead to any jobs.
@@ -698,6 +882,222 @@ def request_onc_jobs(
 
 
 
+# checkDataProduct results keyed by (baseUrl, request_id): (fetched_at, result, is_terminal)
+_DP_STATUS_CACHE: Dict[Tuple[str, int], Tuple[float, Any, bool]] = {}
+_DP_STATUS_TTL_SECONDS = 2.0
+_DP_TERMINAL_STATUSES = frozenset({'COMPLETE', 'COMPLETED', 'FAILED', 'CANCELLED'})
+
+
+def _coerce_status(result: Any) -> Optional[Dict]:
+    """Returns the status row of a checkDataProduct response (a dict, or a list holding one)."""
+    if isinstance(result, dict):
+        return result
+    if isinstance(result, list) and result and isinstance(result[0], dict):
+        return result[0]
+    return None
+
+
+def _search_status(result: Any, default: str = '?') -> str:
+    """Returns the upper-cased searchHdrStatus of a checkDataProduct response, or `default`."""
+    status_info = _coerce_status(result)
+    if status_info is None:
+        return default
+    return str(status_info.get('searchHdrStatus', default)).upper()
+
+
+def _check_data_product(onc_client: ONC, request_id: int, ttl: float = _DP_STATUS_TTL_SECONDS) -> Any:
+    """
+    onc_client.checkDataProduct(request_id) with a small per-request cache.
+    Terminal statuses (complete/failed/cancelled) cannot change, so they are reused
+    for the rest of the run; anything else is reused for at most `ttl` seconds.
+    """
+    key = (onc_client.baseUrl, request_id)
+    now = time.monotonic()
+    cached = _DP_STATUS_CACHE.get(key)
+    if cached and (cached[2] or now - cached[0] < ttl):
+        return cached[1]
+
+    result = onc_client.checkDataProduct(request_id)
+    is_terminal = _search_status(result) in _DP_TERMINAL_STATUSES
+    _DP_STATUS_CACHE[key] = (now, result, is_terminal)
+    return result
+
+
+def _count_product_files(onc_client: ONC, run_id: int, batch_size: int = 8) -> int:
+    """
+    Counts the files of a completed data product run by probing download indexes
+    with HEAD requests, `batch_size` at a time (in order, via executor.map).
+    onc-python's _countFilesInProduct probes one index per round trip; it is still
+    used when the server reports a file as not ready yet (202), since it knows how to wait.
+    """
+    url = f"{onc_client.baseUrl}api/dataProductDelivery/download"
+
+    def probe(index: int) -> int:
+        params = {"token": onc_client.token, "dpRunId": run_id, "index": index}
+        return SESSION.head(url, params=params, timeout=onc_client.timeout).status_code
+
+    count = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=batch_size) as executor:
+        while True:
+            for status in executor.map(probe, range(count + 1, count + batch_size + 1)):
+                if status == 202:
+                    # This is an internal/potentially unstable method, use with caution
+                    return onc_client.delivery._countFilesInProduct(run_id)
+                if status != 200:
+                    return count
+                count += 1
+
+
+def _wait_for_product_file(onc_client: ONC, run_id: int, max_wait: float, interval: float = 2.0) -> None:
+    """
+    Waits (up to `max_wait` seconds) until the first file of a data product run is
+    servable, polling it with a HEAD request every `interval` seconds.
+    Returns as soon as the server stops answering 202 (still being prepared).
+    """
+    url = f"{onc_client.baseUrl}api/dataProductDelivery/download"
+    params = {"token": onc_client.token, "dpRunId": run_id, "index": 1}
+    deadline = time.monotonic() + max_wait
+    while True:
+        try:
+            if SESSION.head(url, params=params, timeout=onc_client.timeout).status_code != 202:
+                return
+        except requests.exceptions.RequestException as e:
+            logging.debug(f"Readiness probe for runId {run_id} failed: {e}")
+            return
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        time.sleep(min(interval, remaining))
+
+
+class _RateLimiter:
+    """
+    Spaces out calls by at least `min_interval` seconds, shared across threads.
+    Only sleeps when the previous call started less than `min_interval` ago.
+    """
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._next_ok_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self) -> None:
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_ok_at - now
+            self._next_ok_at = max(now, self._next_ok_at) + self._min_interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _next_wait(attempt: int, base: float, slow_ext: bool = False) -> float:
+    """
+    Capped exponential backoff with jitter for fallback status polling.
+    Slow-to-generate products (MAT) are allowed to back off further.
+    """
+    cap = base * (12 if slow_ext else 4)
+    return min(cap, base * 2 ** attempt) + random.uniform(0, base / 2)
+
+
+def _download_with_retry(
+    onc_client: ONC,
+    run_id: int,
+    index: int,
+    needs_longer_wait: bool
+) -> Tuple[int, Dict]:
+    """
+    Downloads one file of a data product run with onc-python's internal _DataProductFile.
+    MAT/PDF files get longer polling, and one more attempt after a 10s pause if the
+    first raises. FileExistsError and errors from the last attempt propagate.
+
+    Returns:
+        (status_code, file info dict from getInfo())
+    """
+    # Note: This download method might behave slightly differently than onc.downloadDataProduct
+    # It takes different parameters (e.g., pollPeriod might not be used same way)
+    # We set overwrite=True to match the main download logic intent
+    attempts = [
+        dict(pollPeriod=2.0 if needs_longer_wait else 1.0, maxRetries=5 if needs_longer_wait else 3),
+    ]
+    if needs_longer_wait:
+        attempts.append(dict(pollPeriod=5.0, maxRetries=3))
+
+    for attempt_no, download_params in enumerate(attempts):
+        # A fresh downloader per attempt: _DataProductFile counts retries across download() calls
+        downloader = _DataProductFile(run_id, index, onc_client.baseUrl, onc_client.token)
+        try:
+            status_code = downloader.download(
+                timeout=onc_client.timeout,  # Required parameter - use client's timeout
+                outPath=onc_client.outPath,  # Use main client output path
+                overwrite=True,              # Overwrite if exists locally
+                **download_params
+            )
+            return status_code, downloader.getInfo()
+        except FileExistsError:
+            raise
+        except Exception as download_err:
+            if attempt_no == len(attempts) - 1:
+                raise
+            logging.warning(f"  -> Download of index {index} (runId {run_id}) failed: {download_err}. Retrying after 10s wait...")
+            time.sleep(10)
+
+
+def _download_fallback_file(
+    onc_client: ONC,
+    actual_run_id: int,
+    index_to_download: int,
+    file_ext: str,
+    needs_longer_wait: bool,
+    args: Any,
+    rate_limiter: Optional["_RateLimiter"] = None
+) -> str:
+    """
+    Downloads a single file of a data product run by index (fallback path).
+    Safe to run from a worker thread; all outcomes are logged here.
+
+    Returns:
+        'downloaded', 'skipped' or 'failed'.
+    """
+    debug = bool(getattr(args, 'debug', False) or getattr(args, 'debug_net', False))
+    if debug:
+        utils.dbg(f"Fallback: Downloading runId={actual_run_id}, index={index_to_download}", args=args)
+    # Construct a potential filename for logging before download attempt
+    potential_filename = f"file_{actual_run_id}_{index_to_download}.{file_ext}"
+
+    try:
+        if rate_limiter:
+            rate_limiter.wait()
+        status_code, file_info = _download_with_retry(onc_client, actual_run_id, index_to_download, needs_longer_wait)
+    except FileExistsError:
+        # This is the expected way to detect existing files when overwrite=True isn't fully handled internally or fails
+        logging.info(f"  -> Skip: {potential_filename} (Idx:{index_to_download}) - File already exists locally.")
+        return 'skipped'
+    except Exception as download_err:
+        logging.error(f"  -> Fail: System error downloading index {index_to_download}, runId {actual_run_id}: {download_err}", exc_info=debug)
+        return 'failed'
+
+    actual_filename = file_info.get('file') or potential_filename # Use actual name if available
+
+    # Interpret the status code returned by the internal download method
+    if status_code == 200:
+        logging.info(f"  -> DL OK: {actual_filename} (Idx:{index_to_download}, Size:{utils.human_size(file_info.get('size', 0))})")
+        return 'downloaded'
+    elif status_code == 777: # Internal code for "already exists and overwrite=False" (shouldn't happen with overwrite=True)
+        logging.info(f"  -> Skip: {actual_filename} (Idx:{index_to_download}) - Exists (unexpected with overwrite=True).")
+        return 'skipped'
+    elif status_code == 204: # No content
+        logging.warning(f"  -> Fail: No content (204) for index {index_to_download}, runId {actual_run_id}.")
+    elif status_code == 410: # Gone (file expired on server)
+        logging.warning(f"  -> Fail: File Gone (410) for index {index_to_download}, runId {actual_run_id}.")
+    elif status_code == 404: # Not Found (index invalid?)
+        logging.warning(f"  -> Fail: Not Found (404) for index {index_to_download}, runId {actual_run_id}.")
+    else:
+        # General failure
+        logging.error(f"  -> Fail: DL Index {index_to_download}, runId {actual_run_id}. Status Code: {status_code} ({file_info.get('status', 'Unknown Status')})")
+        if debug:
+            utils.dbg("Failed download info:", file_info, args=args)
+    return 'failed'
+
+
 def _attempt_fallback_download(
     request_id: int,
     actual_run_id: int,
@@ -723,16 +1123,22 @@ def _attempt_fallback_download(
         True if fallback succeeded (fully or partially), False otherwise.
     """
     logging.warning(f"Attempting fallback download for request {request_id} (using actual runId {actual_run_id})...")
+    debug = bool(getattr(args, 'debug', False) or getattr(args, 'debug_net', False))
 
-    file_list_infos = []
     fallback_succeeded = False
     file_count = -1 # Initialize file count as unknown
+    ext_lower = file_ext.lower()
+    is_mat = ext_lower == 'mat'
+    needs_longer_wait = ext_lower in _SLOW_EXTS
 
     # --- 1. Determine File Count ---
     # Try getting file count directly from run_info first if available
     if run_info and isinstance(run_info, dict):
         file_count = run_info.get('fileCount', -1)
-        if file_count >= 0:
+        if file_count == 0:
+            logging.info(f"✔ Fallback: runDataProduct reports 0 data files for request {request_id} (runId {actual_run_id}). Nothing to download.")
+            return True
+        if file_count > 0:
             logging.info(f"Fallback: Using fileCount={file_count} from runDataProduct result.")
         else:
             logging.warning("Fallback: fileCount missing or invalid in run_info. Will attempt to poll/count.")
@@ -741,51 +1147,48 @@ def _attempt_fallback_download(
     # If file count is still unknown, poll status and try internal count method
     if file_count < 0:
         # Add longer initial wait for MAT files
-        initial_wait = 5.0 if file_ext.lower() == 'mat' else 3.0
+        initial_wait = 5.0 if is_mat else 3.0
         logging.info(f"Fallback: File count unknown. Waiting {initial_wait}s then polling status for request {request_id}...")
         time.sleep(initial_wait)
         onc_status = 'UNKNOWN'
 
         for attempt in range(args.fallback_retries + 1): # +1 because we wait between retries
             try:
-                utils.dbg(f"Fallback attempt {attempt + 1}/{args.fallback_retries}: Checking status for request {request_id}", args=args)
+                if debug:
+                    utils.dbg(f"Fallback attempt {attempt + 1}/{args.fallback_retries}: Checking status for request {request_id}", args=args)
                 # Use checkDataProduct on the *request_id* to see overall status
-                status_check_result = onc_client.checkDataProduct(request_id)
-                utils.dbg(f"Status check response for {request_id}:", status_check_result, args=args)
-
-                status_info = None
-                if isinstance(status_check_result, dict):
-                    status_info = status_check_result
-                elif isinstance(status_check_result, list) and status_check_result and isinstance(status_check_result[0], dict):
-                    # Sometimes it returns a list with one status dict
-                    status_info = status_check_result[0]
-                else:
+                status_check_result = _check_data_product(onc_client, request_id)
+                if debug:
+                    utils.dbg(f"Status check response for {request_id}:", status_check_result, args=args)
+
+                status_info = _coerce_status(status_check_result)
+                if status_info is None:
                     logging.error(f"Fallback: Invalid structure from checkDataProduct for request {request_id}. Type: {type(status_check_result)}")
                     # Wait and retry, maybe it's a transient issue
-                    if attempt < args.fallback_retries: time.sleep(args.fallback_wait); continue
+                    if attempt < args.fallback_retries: time.sleep(_next_wait(attempt, args.fallback_wait, is_mat)); continue
                     else: break # Failed after retries
 
-                onc_status = status_info.get('searchHdrStatus', 'UNKNOWN').upper()
-                utils.dbg(f"Request {request_id} ONC status: {onc_status}", args=args)
+                onc_status = _search_status(status_info, 'UNKNOWN')
+                if debug:
+                    utils.dbg(f"Request {request_id} ONC status: {onc_status}", args=args)
 
                 if onc_status in ['COMPLETE', 'COMPLETED']:
                     logging.info(f"Fallback: Request status is {onc_status}. Determining file count using runId {actual_run_id}...")
                     try:
                         # Use the *actual_run_id* for the count method
-                        logging.info(f"Fallback: Using internal _countFilesInProduct for runId {actual_run_id}...")
-                        # This is an internal/potentially unstable method, use with caution
-                        file_count = onc_client.delivery._countFilesInProduct(actual_run_id)
+                        logging.info(f"Fallback: Counting files for runId {actual_run_id}...")
+                        file_count = _count_product_files(onc_client, actual_run_id)
                         if file_count < 0:
-                             logging.warning(f"Fallback: _countFilesInProduct returned {file_count} for runId {actual_run_id}. Assuming count failed.")
+                             logging.warning(f"Fallback: File count returned {file_count} for runId {actual_run_id}. Assuming count failed.")
                              file_count = -1 # Mark as failed
                         else:
-                             logging.info(f"Fallback: _countFilesInProduct determined file count: {file_count}")
+                             logging.info(f"Fallback: Determined file count: {file_count}")
 
                     except AttributeError:
                          logging.error("Fallback: ONC client object missing 'delivery' attribute or '_countFilesInProduct' method. Cannot count files.")
                          file_count = -1
                     except Exception as count_err:
-                         logging.error(f"Fallback: Error calling _countFilesInProduct for runId {actual_run_id}: {count_err}", exc_info=args.debug)
+                         logging.error(f"Fallback: Error counting files for runId {actual_run_id}: {count_err}", exc_info=debug)
                          file_count = -1
                     break # Exit status polling loop once COMPLETE status is reached
 
@@ -795,18 +1198,17 @@ def _attempt_fallback_download(
                     break # Stop polling
 
                 else: # Still running, queued, etc.
-                    utils.dbg(f"Status '{onc_status}'. Waiting {args.fallback_wait}s...", args=args)
+                    if debug:
+                        utils.dbg(f"Status '{onc_status}'. Waiting before next poll...", args=args)
 
             except Exception as e:
-                logging.error(f"Error during fallback status poll for request {request_id}: {e}", exc_info=args.debug)
+                logging.error(f"Error during fallback status poll for request {request_id}: {e}", exc_info=debug)
                 file_count = -1 # Assume failure on exception
                 break # Stop polling
 
             # Wait before the next attempt
             if attempt < args.fallback_retries:
-                # Add exponential backoff for MAT files
-                wait_time = args.fallback_wait * (2 ** attempt) if file_ext.lower() == 'mat' else args.fallback_wait
-                time.sleep(wait_time)
+                time.sleep(_next_wait(attempt, args.fallback_wait, is_mat))
             else:
                 logging.error(f"Fallback timed out waiting for request {request_id} to complete (last status: {onc_status}).")
                 file_count = -1 # Mark as failed due to timeout
@@ -816,148 +1218,52 @@ def _attempt_fallback_download(
         logging.error(f"✖ Fallback failed for request {request_id} (runId {actual_run_id}). Could not determine file count.")
         return False # Cannot proceed without file count
 
-    if file_count == 0:
+    if file_count == 0: # Counted while polling; the run_info case returned above
         logging.info(f"✔ Fallback determined 0 data files for request {request_id} (runId {actual_run_id}). Assuming success.")
         return True # Nothing to download
 
     # --- 2. Generate File List ---
     logging.info(f"Fallback: Generating file list for {file_count} files (using runId {actual_run_id})...")
-    indexes_to_try = [str(i) for i in range(1, file_count + 1)] # Data files are typically indexed 1 to N
-    try:
-        # Need base URL and token for _DataProductFile internal class
-        # Accessing protected members (_baseUrl, _token) is not ideal but necessary here
-        base_url = onc_client.baseUrl
-        token = onc_client.token
-        if not base_url or not token:
-             logging.error("Fallback Error: Cannot get baseUrl or token from ONC client.")
-             return False
-
-        # Instantiate _DataProductFile for each index to get its metadata
-        # This involves API calls for each file's info!
-        file_list_infos = [_DataProductFile(actual_run_id, index, base_url, token).getInfo() for index in indexes_to_try]
-
-        # Validate generated list
-        valid_infos = [info for info in file_list_infos if isinstance(info, dict) and info.get('index')]
-        if len(valid_infos) != file_count:
-             logging.warning(f"Fallback: Generated info for {len(valid_infos)} files, but expected {file_count}. Some file info might be missing.")
-             # Proceed with what we have, but log the discrepancy
-
-        if not valid_infos: # Check if we got *any* valid info
-            logging.error(f"Fallback: Failed to generate any valid file info objects for runId {actual_run_id}.")
-            return False
-
-        file_list_infos = valid_infos # Use only the valid ones
-
-    except AttributeError as ae:
-        logging.error(f"Fallback Error: Missing attributes needed for _DataProductFile (check onc-python version?). Error: {ae}", exc_info=args.debug)
-        return False
-    except Exception as gen_err:
-        logging.error(f"Fallback Error generating file info list for runId {actual_run_id}: {gen_err}", exc_info=args.debug)
+    # Need base URL and token for the _DataProductFile internal class used per download
+    if not getattr(onc_client, 'baseUrl', None) or not getattr(onc_client, 'token', None):
+        logging.error("Fallback Error: Cannot get baseUrl or token from ONC client.")
         return False
 
+    # Data files are indexed 1 to N. _DataProductFile.getInfo() only echoes the index back
+    # (no name/size until a file is downloaded), so there is no metadata worth fetching up front.
+    indexes_to_download = range(1, file_count + 1) # requests encodes the int index in the query string
+
     # --- 3. Individual File Download ---
-    logging.info(f"Fallback: Attempting download for {len(file_list_infos)} file(s) individually (runId {actual_run_id})...")
+    fallback_workers = max(1, getattr(args, 'fallback_workers', DEFAULT_FALLBACK_WORKERS) or DEFAULT_FALLBACK_WORKERS)
+    logging.info(f"Fallback: Attempting download for {len(indexes_to_download)} file(s) individually (runId {actual_run_id}, {fallback_workers} parallel)...")
     files_downloaded_count = 0
     files_failed_count = 0
     files_skipped_count = 0 # Count files skipped because they already exist
 
-    # Add longer wait between files for MAT/PDF files
-    needs_longer_wait = file_ext.lower() in ('mat', 'pdf')
-    inter_file_wait = 2.0 if needs_longer_wait else 0.5
-
-    for f_info in file_list_infos:
-        index_to_download = f_info.get('index')
-        if not index_to_download:
-            logging.warning(f"Fallback: Skipping entry with missing index in file info: {f_info}")
-            files_failed_count += 1
-            continue
-
-        utils.dbg(f"Fallback: Downloading runId={actual_run_id}, index={index_to_download}", args=args)
-        # Construct a potential filename for logging before download attempt
-        potential_filename = f"file_{actual_run_id}_{index_to_download}.{file_ext}"
-        actual_filename = potential_filename # Default name if download fails early
-
-        try:
-            # Small delay between individual file requests
-            time.sleep(inter_file_wait)
-
-            # Use _DataProductFile internal class to download this specific file index
-            downloader = _DataProductFile(actual_run_id, index_to_download, onc_client.baseUrl, onc_client.token)
+    # MAT/PDF files are slower to generate server-side, so space their downloads out further
+    rate_limiter = _RateLimiter(FALLBACK_SLOW_FILE_INTERVAL_SECONDS if needs_longer_wait else FALLBACK_FILE_INTERVAL_SECONDS)
 
-            # Use download method of the internal class
-            # Note: This download method might behave slightly differently than onc.downloadDataProduct
-            # It takes different parameters (e.g., pollPeriod might not be used same way)
-            # We set overwrite=True to match the main download logic intent
-            status_code = downloader.download(
-                timeout=onc_client.timeout,  # Required parameter - use client's timeout
-                pollPeriod=2.0 if needs_longer_wait else 1.0,  # Longer poll period for MAT/PDF files
-                outPath=onc_client.outPath,      # Use main client output path
-                maxRetries=5 if needs_longer_wait else 3,  # More retries for MAT/PDF files
-                overwrite=True                   # Overwrite if exists locally
+    with concurrent.futures.ThreadPoolExecutor(max_workers=fallback_workers) as executor:
+        futures = [
+            executor.submit(
+                _download_fallback_file,
+                onc_client, actual_run_id, index_to_download, file_ext, needs_longer_wait, args, rate_limiter
             )
+            for index_to_download in indexes_to_download
+        ]
 
-            # Get info again *after* download attempt to get final status and filename
-            downloaded_info = downloader.getInfo()
-            actual_filename = downloaded_info.get('file') or actual_filename # Use actual name if available
-
-            # Interpret the status code returned by the internal download method
-            if status_code == 200:
-                size = downloaded_info.get('size', 0)
-                logging.info(f"  -> DL OK: {actual_filename} (Idx:{index_to_download}, Size:{utils.human_size(size)})")
+        for future in concurrent.futures.as_completed(futures):
+            outcome = future.result()
+            if outcome == 'downloaded':
                 files_downloaded_count += 1
-            elif status_code == 777: # Internal code for "already exists and overwrite=False" (shouldn't happen with overwrite=True)
-                logging.info(f"  -> Skip: {actual_filename} (Idx:{index_to_download}) - Exists (unexpected with overwrite=True).")
+            elif outcome == 'skipped':
                 files_skipped_count += 1
-             # Add check for FileExistsError being caught separately below, which is more reliable for skipping
-            elif status_code == 204: # No content
-                logging.warning(f"  -> Fail: No content (204) for index {index_to_download}, runId {actual_run_id}.")
-                files_failed_count += 1
-            elif status_code == 410: # Gone (file expired on server)
-                logging.warning(f"  -> Fail: File Gone (410) for index {index_to_download}, runId {actual_run_id}.")
-                files_failed_count += 1
-            elif status_code == 404: # Not Found (index invalid?)
-                 logging.warning(f"  -> Fail: Not Found (404) for index {index_to_download}, runId {actual_run_id}.")
-                 files_failed_count += 1
             else:
-                # General failure
-                fail_status_msg = downloaded_info.get('status', 'Unknown Status')
-                logging.error(f"  -> Fail: DL Index {index_to_download}, runId {actual_run_id}. Status Code: {status_code} ({fail_status_msg})")
-                utils.dbg("Failed download info:", downloaded_info, args=args)
                 files_failed_count += 1
 
-        except FileExistsError:
-            # This is the expected way to detect existing files when overwrite=True isn't fully handled internally or fails
-             logging.info(f"  -> Skip: {actual_filename} (Idx:{index_to_download}) - File already exists locally.")
-             files_skipped_count += 1
-        except Exception as download_err:
-            logging.error(f"  -> Fail: System error downloading index {index_to_download}, runId {actual_run_id}: {download_err}", exc_info=args.debug)
-            files_failed_count += 1
-
-            # For MAT/PDF files, add extra retry with longer wait on failure
-            if needs_longer_wait:
-                try:
-                    logging.info(f"  -> Retrying {file_ext.upper()} file download after 10s wait...")
-                    time.sleep(10)
-                    status_code = downloader.download(
-                        timeout=onc_client.timeout,  # Required parameter - use client's timeout
-                        pollPeriod=5.0,  # Longer poll period for retry
-                        outPath=onc_client.outPath,
-                        maxRetries=3,
-                        overwrite=True
-                    )
-                    if status_code == 200:
-                        size = downloader.getInfo().get('size', 0)
-                        logging.info(f"  -> Retry OK: {actual_filename} (Idx:{index_to_download}, Size:{utils.human_size(size)})")
-                        files_downloaded_count += 1
-                        files_failed_count -= 1  # Remove from failed count since retry succeeded
-                    else:
-                        logging.error(f"  -> Retry failed with status code: {status_code}")
-                except Exception as retry_err:
-                    logging.error(f"  -> Retry failed: {retry_err}")
-
     # --- 4. Fallback Summary ---
     total_processed = files_downloaded_count + files_skipped_count + files_failed_count
-    expected_total = len(file_list_infos) # Use the count of infos we attempted to download
+    expected_total = len(indexes_to_download)
 
     if files_failed_count == 0:
         logging.info(f"✔ Fallback OK for request {request_id} (runId {actual_run_id}). Got {files_downloaded_count} new, skipped {files_skipped_count} existing files.")
@@ -970,18 +1276,122 @@ def _attempt_fallback_download(
         fallback_succeeded = False
 
     if total_processed != expected_total:
-         logging.warning(f"Fallback Discrepancy: Processed {total_processed} files, but expected {expected_total} based on generated info list.")
+         logging.warning(f"Fallback Discrepancy: Processed {total_processed} files, but expected {expected_total} based on the file count.")
 
     return fallback_succeeded
 
 
+def _client_with_timeout(onc_client: ONC, timeout: int) -> ONC:
+    """
+    Returns an ONC client with the same token, output path and flags as onc_client
+    but a different request timeout. Clients are created once and memoized on onc_client.
+    """
+    if onc_client.timeout == timeout:
+        return onc_client
+    clients = onc_client.__dict__.setdefault('_timeout_clients', {})
+    if timeout not in clients:
+        clients[timeout] = ONC(
+            onc_client.token,
+            production=onc_client.production,
+            showInfo=onc_client.showInfo,
+            showWarning=onc_client.showWarning,
+            outPath=onc_client.outPath,
+            timeout=timeout
+        )
+    return clients[timeout]
+
+
+def _download_archive_file(onc_client: ONC, filename: str, overwrite: bool) -> Tuple[str, Optional[Dict]]:
+    """
+    Downloads one archive file with onc_client.getFile (safe to run from a worker thread).
+
+    Returns:
+        ('downloaded', getFile info) or ('skipped' | 'failed', None).
+    """
+    try:
+        return 'downloaded', onc_client.getFile(filename=filename, overwrite=overwrite)
+    except FileExistsError:
+        logging.info(f"\n Skip: {filename} (Exists)")
+        return 'skipped', None
+    except Exception as dl_err:
+        logging.error(f"\n Fail DL {filename}: {dl_err}")
+        return 'failed', None
+
+
+# Sizes of archive files this tool downloaded, one JSON object per line, kept in the output directory
+_ARCHIVE_MANIFEST_NAME = ".hydrophone_manifest.jsonl"
+
+
+def _load_archive_manifest(output_path: Path) -> Dict[str, int]:
+    """Returns {filename: size} recorded in the output directory's archive manifest (last entry wins)."""
+    sizes: Dict[str, int] = {}
+    try:
+        with open(output_path / _ARCHIVE_MANIFEST_NAME) as manifest:
+            for line in manifest:
+                try:
+                    entry = json.loads(line)
+                    sizes[entry['filename']] = int(entry['size'])
+                except (ValueError, KeyError, TypeError):
+                    continue # Skip partial/corrupt lines
+    except OSError:
+        pass
+    return sizes
+
+
+# Per-job outcomes appended after every job, so an interrupted run can be resumed
+_RUN_LOG_NAME = ".hydrophone_runlog.jsonl"
+
+
+def _archive_resume_key(job: Job) -> str:
+    """Identifies an archive job across runs (device, extension and time window)."""
+    filters = job.payload
+    return f"{job.device_code}|{job.ext.lower()}|{filters.get('dateFrom')}|{filters.get('dateTo')}"
+
+
+def _load_completed_jobs(output_path: Path) -> Dict[str, List[str]]:
+    """
+    Returns {resume_key: filenames} for the jobs the run log in output_path records
+    as having successfully fetched files. Entries without a file list are not resumable.
+    """
+    completed = {}
+    try:
+        with open(output_path / _RUN_LOG_NAME) as run_log:
+            for line in run_log:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue # Skip partial/corrupt lines
+                if entry.get('status') == 'Success' and entry.get('resume_key') and entry.get('files'):
+                    completed[entry['resume_key']] = entry['files']
+    except OSError:
+        pass
+    return completed
+
+
+def _files_present(output_path: Path) -> set:
+    """Names of the files in output_path and its immediate subfolders (where organize moves them)."""
+    names = set()
+    try:
+        with os.scandir(output_path) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    names.add(entry.name)
+                elif entry.is_dir():
+                    with os.scandir(entry.path) as sub_entries:
+                        names.update(sub.name for sub in sub_entries if sub.is_file())
+    except OSError:
+        pass
+    return names
+
+
 def process_download_jobs(
-    jobs: List[Tuple[str, Any, str, str]], # Expect ('type', id_or_filters_or_params, device_code, ext)
+    jobs: List[Job],
     onc_client: ONC,
     output_path: Path,
     args: Any
 ) -> Tuple[bool, Dict[str, Dict]]: # Return detailed job_statuses dict
     """Runs data product jobs, HDP orders, OR downloads archive files."""
+    debug = bool(getattr(args, 'debug', False) or getattr(args, 'debug_net', False))
     logging.info(f"Starting processing for {len(jobs)} job(s)/order(s)/archive request(s)...")
     print("\nStarting download process...")
     all_jobs_overall_success = True
@@ -993,433 +1403,494 @@ def process_download_jobs(
     # Track successful downloads by device for organization
     successful_device_downloads = defaultdict(bool)
 
-    for job_type, request_info, device_code, ext in jobs:
-        status_info: Dict[str, Any] = {
-            'status': 'Unknown',
-            'reason': '',
-            'details': {
-                'files_expected': 0,
-                'files_downloaded': 0,
-                'files_skipped': 0,
-                'files_failed': 0
+    # runDataProduct blocks until ONC finishes generating the product, so start every
+    # data product run up front; each job below then only waits on its own run.
+    dp_request_ids = list(dict.fromkeys(job.payload for job in jobs if job.kind == 'dataproduct'))
+    run_executor = None
+    run_futures: Dict[Any, concurrent.futures.Future] = {}
+    if dp_request_ids:
+        logging.info(f"Running {len(dp_request_ids)} data product request(s)...")
+        run_executor = concurrent.futures.ThreadPoolExecutor(max_workers=min(DP_REQUEST_MAX_WORKERS, len(dp_request_ids)))
+        run_futures = {rid: run_executor.submit(onc_client.runDataProduct, rid) for rid in dp_request_ids}
+
+    try:
+        # Archive jobs completed by an earlier (possibly interrupted) run into this directory are
+        # skipped, as long as the files they fetched are still there
+        completed_jobs = {} if args.test or getattr(args, 'force', False) else _load_completed_jobs(output_path)
+        present_files = _files_present(output_path) if completed_jobs else set()
+        run_log_path = output_path / _RUN_LOG_NAME
+
+        for job in jobs:
+            device_code, ext = job.device_code, job.ext
+            ext_lower = ext.lower()
+            resume_key = _archive_resume_key(job) if job.kind == 'archive' else None
+            job_files: List[str] = [] # Files this job fetched or found; recorded so a later run can resume
+            status_info: Dict[str, Any] = {
+                'status': 'Unknown',
+                'reason': '',
+                'details': {
+                    'files_expected': 0,
+                    'files_downloaded': 0,
+                    'files_skipped': 0,
+                    'files_failed': 0
+                }
             }
-        }
-        job_succeeded = False # Default to not succeeded
-
-        # === Handle Data Product Downloads (PNG, TXT, etc.) ===
-        if job_type == 'dataproduct':
-            request_id = request_info
-            job_status_key = f"Req_{request_id}_{device_code}_{ext}"
-            print(f"\n--- Processing {job_status_key} ---")
-            trigger_fallback = False
-            run_info = None
-            run_succeeded = False
-            job_status_final = 'UNKNOWN'
-            actual_run_id = None
-            files_dp_downloaded = 0
-            files_dp_skipped = 0
-            files_dp_failed = 0
-            files_dp_expected = -1
+            job_succeeded = False # Default to not succeeded
+
+            # === Handle Data Product Downloads (PNG, TXT, etc.) ===
+            if job.kind == 'dataproduct':
+                request_id = job.payload
+                job_status_key = f"Req_{request_id}_{device_code}_{ext}"
+                needs_longer_wait = ext_lower in _SLOW_EXTS # MAT/PDF products take longer server-side
+                print(f"\n--- Processing {job_status_key} ---")
+                trigger_fallback = False
+                run_info = None
+                run_succeeded = False
+                job_status_final = 'UNKNOWN'
+                actual_run_id = None
+                files_dp_downloaded = 0
+                files_dp_skipped = 0
+                files_dp_failed = 0
+                files_dp_expected = -1
 
-            try:
-                # Step 1: Run and wait
-                logging.info(f"Running request ID {request_id}...")
                 try:
-                    run_info = onc_client.runDataProduct(request_id)
-                    utils.dbg("runDataProduct result:", run_info, args=args)
+                    # Step 1: Wait for the run started above
+                    logging.info(f"Waiting for run of request ID {request_id}...")
+                    try:
+                        run_info = run_futures[request_id].result()
+                        utils.dbg("runDataProduct result:", run_info, args=args)
                     
-                    # Parse run info - handle both old and new API response formats
-                    if isinstance(run_info, dict):
-                        # New format: direct access
-                        actual_run_id = run_info.get('dpRunId')
-                        if not actual_run_id and 'runIds' in run_info:
-                            # Handle older format where runId was in runIds array
-                            run_ids = run_info.get('runIds', [])
-                            if run_ids and len(run_ids) > 0:
-                                actual_run_id = run_ids[0]
+                        # Parse run info - handle both old and new API response formats
+                        if isinstance(run_info, dict):
+                            # New format: direct access
+                            actual_run_id = run_info.get('dpRunId')
+                            if not actual_run_id and 'runIds' in run_info:
+                                # Handle older format where runId was in runIds array
+                                run_ids = run_info.get('runIds', [])
+                                if run_ids and len(run_ids) > 0:
+                                    actual_run_id = run_ids[0]
                         
-                        files_dp_expected = run_info.get('fileCount', -1)
+                            files_dp_expected = run_info.get('fileCount', -1)
                         
-                        if actual_run_id:  # We have a valid run ID
-                            run_succeeded = True
-                            try:
-                                final_status_check = onc_client.checkDataProduct(request_id)
-                                final_onc_status = final_status_check.get('searchHdrStatus', '?') if isinstance(final_status_check, dict) else (final_status_check[0].get('searchHdrStatus', '?') if isinstance(final_status_check, list) and final_status_check else '?')
-                                final_onc_status = final_onc_status.upper()
-                                utils.dbg(f"Parsed final status: {final_onc_status}", args=args)
-
-                                if final_onc_status in ['COMPLETE', 'COMPLETED']:
-                                    if files_dp_expected == 0:
-                                        job_succeeded = True
-                                        status_info['status'] = 'Success'
-                                        status_info['reason'] = '0 Files Generated'
-                                        logging.info("  ONC reported 0 files generated.")
-                                    elif files_dp_expected > 0:
-                                        logging.info(f"  ONC reported {files_dp_expected} files generated.")
+                            if actual_run_id:  # We have a valid run ID
+                                run_succeeded = True
+                                try:
+                                    final_status_check = _check_data_product(onc_client, request_id)
+                                    final_onc_status = _search_status(final_status_check)
+                                    utils.dbg(f"Parsed final status: {final_onc_status}", args=args)
+
+                                    if final_onc_status in ['COMPLETE', 'COMPLETED']:
+                                        if files_dp_expected == 0:
+                                            job_succeeded = True
+                                            status_info['status'] = 'Success'
+                                            status_info['reason'] = '0 Files Generated'
+                                            logging.info("  ONC reported 0 files generated.")
+                                        elif files_dp_expected > 0:
+                                            logging.info(f"  ONC reported {files_dp_expected} files generated.")
+                                        else:
+                                            logging.warning("  ONC reported invalid file count.")
+                                    elif final_onc_status in ['FAILED', 'CANCELLED']:
+                                        status_info['status'] = 'Failed'
+                                        status_info['reason'] = f'ONC Status {final_onc_status}'
+                                        run_succeeded = False
+                                        logging.error(f"✖ Request {request_id} final status: {final_onc_status}.")
                                     else:
-                                        logging.warning("  ONC reported invalid file count.")
-                                elif final_onc_status in ['FAILED', 'CANCELLED']:
-                                    status_info['status'] = 'Failed'
-                                    status_info['reason'] = f'ONC Status {final_onc_status}'
-                                    run_succeeded = False
-                                    logging.error(f"✖ Request {request_id} final status: {final_onc_status}.")
-                                else:
-                                    status_info['status'] = 'Failed'
-                                    status_info['reason'] = f'Unknown ONC Status {final_onc_status}'
+                                        status_info['status'] = 'Failed'
+                                        status_info['reason'] = f'Unknown ONC Status {final_onc_status}'
+                                        run_succeeded = False
+                                        logging.warning(f"⚠ Request {request_id} unexpected final status: {final_onc_status}.")
+                                except Exception as status_err:
+                                    logging.warning(f"⚠ Error checking status: {status_err}.")
                                     run_succeeded = False
-                                    logging.warning(f"⚠ Request {request_id} unexpected final status: {final_onc_status}.")
-                            except Exception as status_err:
-                                logging.warning(f"⚠ Error checking status: {status_err}.")
+                                    job_status_final = 'STATUS_CHECK_ERROR'
+                            else:
+                                logging.error("✖ Failed to get valid run ID from response.")
                                 run_succeeded = False
-                                job_status_final = 'STATUS_CHECK_ERROR'
+                                job_status_final = 'INVALID_RUN_INFO'
                         else:
-                            logging.error("✖ Failed to get valid run ID from response.")
+                            logging.error("✖ Invalid response format from runDataProduct.")
                             run_succeeded = False
-                            job_status_final = 'INVALID_RUN_INFO'
-                    else:
-                        logging.error("✖ Invalid response format from runDataProduct.")
+                            job_status_final = 'INVALID_RESPONSE'
+                    except requests.exceptions.HTTPError as http_err:
+                        if http_err.response is not None and http_err.response.status_code == 400 and _API_SKIP_RE.search(str(http_err)):
+                            status_info['status'] = 'Skipped'
+                            status_info['reason'] = 'Permissions Error (API 71)'
+                            logging.warning(f"⚠ {job_status_key}: Skipped due to permissions.")
+                            job_succeeded = True  # Consider permission skips as "success"
+                        else:
+                            status_info['status'] = 'Failed'
+                            status_info['reason'] = 'Run Step HTTP Error'
+                            logging.error(f"✖ {job_status_key}: HTTP error during run: {http_err}")
                         run_succeeded = False
-                        job_status_final = 'INVALID_RESPONSE'
-                except requests.exceptions.HTTPError as http_err:
-                    err_text = str(http_err).lower()
-                    if http_err.response is not None and http_err.response.status_code == 400 and ("api error 71" in err_text or "permissions not granted" in err_text):
-                        status_info['status'] = 'Skipped'
-                        status_info['reason'] = 'Permissions Error (API 71)'
-                        logging.warning(f"⚠ {job_status_key}: Skipped due to permissions.")
-                        job_succeeded = True  # Consider permission skips as "success"
-                    else:
-                        status_info['status'] = 'Failed'
-                        status_info['reason'] = 'Run Step HTTP Error'
-                        logging.error(f"✖ {job_status_key}: HTTP error during run: {http_err}")
-                    run_succeeded = False
-                    job_status_final = 'RUN_ERROR'
-                except Exception as run_err:
-                    logging.error(f"✖ Error running request {request_id}: {run_err}", exc_info=args.debug)
-                    run_succeeded = False
-                    job_status_final = 'RUN_ERROR'
-
-                # Step 2: Download data product
-                if run_succeeded and not job_succeeded:
-                    if actual_run_id is None:
-                        logging.error("✖ Cannot download: Run ID unknown.")
-                        status_info['status'] = 'Failed'
-                        status_info['reason'] = 'Missing Run ID'
-                    else:
-                        # Add longer wait for MAT/PDF files
-                        needs_longer_wait = ext.lower() in ('mat', 'pdf')
-                        wait_before_download = 10 if needs_longer_wait else 5
-                        logging.info(f"Waiting {wait_before_download}s...")
-                        time.sleep(wait_before_download)
-                        logging.info(f"Attempting download for runId {actual_run_id}...")
-                        try:
-                            # Increase retries for MAT/PDF files
-                            max_retries = 5 if needs_longer_wait else 3
-                            dl_args = dict(
-                                runId=actual_run_id,
-                                maxRetries=max_retries,
-                                downloadResultsOnly=False,
-                                includeMetadataFile=False,
-                                overwrite=args.yes
-                            )
-                            # Temporarily increase client timeout for MAT/PDF files
-                            original_timeout = onc_client.timeout
-                            if needs_longer_wait:
-                                onc_client.timeout = 300  # 5 minutes for MAT/PDF files
+                        job_status_final = 'RUN_ERROR'
+                    except Exception as run_err:
+                        logging.error(f"✖ Error running request {request_id}: {run_err}", exc_info=debug)
+                        run_succeeded = False
+                        job_status_final = 'RUN_ERROR'
+
+                    # Step 2: Download data product
+                    if run_succeeded and not job_succeeded:
+                        if actual_run_id is None:
+                            logging.error("✖ Cannot download: Run ID unknown.")
+                            status_info['status'] = 'Failed'
+                            status_info['reason'] = 'Missing Run ID'
+                        else:
+                            # Add longer wait for MAT/PDF files
+                            wait_before_download = 10 if needs_longer_wait else 5
+                            logging.info(f"Waiting {wait_before_download}s...")
+                            time.sleep(wait_before_download)
+                            logging.info(f"Attempting download for runId {actual_run_id}...")
                             try:
-                                dl_result = onc_client.downloadDataProduct(**dl_args)
-                            finally:
-                                # Restore original timeout
-                                onc_client.timeout = original_timeout
-
-                            if isinstance(dl_result, list):
-                                if not dl_result and files_dp_expected == 0:
-                                    job_succeeded = True
-                                    status_info['status'] = 'Success'
-                                    status_info['reason'] = '0 Files Generated (Confirmed)'
-                                    files_dp_downloaded = 0
-                                    files_dp_skipped = 0
-                                elif not dl_result:
-                                    trigger_fallback = True
-                                    logging.warning(f"⚠ DL empty but {files_dp_expected} files expected.")
-                                else:
-                                    # Analyze results
-                                    succ = [item for item in dl_result if isinstance(item, dict) and (str(item.get('status','')).lower() == 'complete' or item.get('downloaded') is True)]
-                                    errs = [item for item in dl_result if isinstance(item, dict) and 'error' in str(item.get('status','')).lower()]
-                                    skip = [item for item in dl_result if isinstance(item, dict) and str(item.get('status','')).lower() == 'skipped']
-                                    files_dp_downloaded = len(succ)
-                                    files_dp_skipped = len(skip)
-                                    files_dp_failed = len(errs)
-                                    
-                                    # If a file was skipped, consider it a success
-                                    if files_dp_skipped > 0:
-                                        files_dp_downloaded = 0
+                                # Increase retries for MAT/PDF files
+                                max_retries = 5 if needs_longer_wait else 3
+                                dl_args = dict(
+                                    runId=actual_run_id,
+                                    maxRetries=max_retries,
+                                    downloadResultsOnly=False,
+                                    includeMetadataFile=False,
+                                    overwrite=args.yes
+                                )
+                                # MAT/PDF files get a longer timeout via a sibling client, so the shared
+                                # client's timeout never changes under the concurrent runDataProduct calls
+                                dl_client = onc_client
+                                if needs_longer_wait:
+                                    dl_client = _client_with_timeout(onc_client, getattr(args, 'download_timeout', None) or DEFAULT_SLOW_DOWNLOAD_TIMEOUT)
+                                dl_result = dl_client.downloadDataProduct(**dl_args)
+
+                                if isinstance(dl_result, list):
+                                    if not dl_result and files_dp_expected == 0:
                                         job_succeeded = True
                                         status_info['status'] = 'Success'
-                                        status_info['reason'] = 'Files Already Exist'
-                                        logging.info(f"✔ All files already exist, skipped {files_dp_skipped} file(s).")
-                                    elif files_dp_failed > 0:
-                                        logging.error(f"✖ DL had {files_dp_failed} error(s).")
+                                        status_info['reason'] = '0 Files Generated (Confirmed)'
+                                        files_dp_downloaded = 0
+                                        files_dp_skipped = 0
+                                    elif not dl_result:
                                         trigger_fallback = True
-                                    elif files_dp_downloaded > 0:
-                                        job_succeeded = True
-                                        status_info['status'] = 'Success'
-                                        logging.info(f"✔ Successfully downloaded {files_dp_downloaded} file(s).")
+                                        logging.warning(f"⚠ DL empty but {files_dp_expected} files expected.")
                                     else:
-                                        trigger_fallback = True
-                                        logging.warning("⚠ DL status unclear.")
-                            else:
+                                        # Analyze results in one pass (counts only; the rows themselves aren't needed)
+                                        for item in dl_result:
+                                            if not isinstance(item, dict):
+                                                continue
+                                            item_status = str(item.get('status', '')).lower()
+                                            if item_status == 'complete' or item.get('downloaded') is True:
+                                                files_dp_downloaded += 1
+                                            if 'error' in item_status:
+                                                files_dp_failed += 1
+                                            if item_status == 'skipped':
+                                                files_dp_skipped += 1
+                                    
+                                        # If a file was skipped, consider it a success
+                                        if files_dp_skipped > 0:
+                                            files_dp_downloaded = 0
+                                            job_succeeded = True
+                                            status_info['status'] = 'Success'
+                                            status_info['reason'] = 'Files Already Exist'
+                                            logging.info(f"✔ All files already exist, skipped {files_dp_skipped} file(s).")
+                                        elif files_dp_failed > 0:
+                                            logging.error(f"✖ DL had {files_dp_failed} error(s).")
+                                            trigger_fallback = True
+                                        elif files_dp_downloaded > 0:
+                                            job_succeeded = True
+                                            status_info['status'] = 'Success'
+                                            logging.info(f"✔ Successfully downloaded {files_dp_downloaded} file(s).")
+                                        else:
+                                            trigger_fallback = True
+                                            logging.warning("⚠ DL status unclear.")
+                                else:
+                                    trigger_fallback = True
+                                    logging.warning("⚠ DL returned unexpected type.")
+                            except Exception as dl_err:
+                                logging.error(f"✖ DL Error: {dl_err}", exc_info=debug)
                                 trigger_fallback = True
-                                logging.warning("⚠ DL returned unexpected type.")
-                        except Exception as dl_err:
-                            logging.error(f"✖ DL Error: {dl_err}", exc_info=args.debug)
-                            trigger_fallback = True
-
-                # Step 3: Fallback for data products if needed
-                if trigger_fallback and not job_succeeded:
-                    if actual_run_id is None:
-                        logging.error("Cannot fallback: Run ID unknown.")
-                    else:
-                        logging.info(f"Checking status again before fallback for {request_id}...")
-                        final_status_fb = 'UNKNOWN'
-                        try:
-                            fb_stat = onc_client.checkDataProduct(request_id)
-                            final_status_fb = fb_stat.get('searchHdrStatus','?') if isinstance(fb_stat,dict) else (fb_stat[0].get('searchHdrStatus','?') if isinstance(fb_stat,list) and fb_stat else '?')
-                            final_status_fb = final_status_fb.upper()
-                        except Exception as e:
-                            logging.warning(f"Fallback status check failed: {e}")
-
-                        if final_status_fb in ['COMPLETE', 'COMPLETED']:
-                            logging.info(f"Proceeding with fallback for {request_id} (runId {actual_run_id}).")
-                            # For MAT/PDF files, add extra wait before fallback
-                            needs_longer_wait = ext.lower() in ('mat', 'pdf')
-                            if needs_longer_wait:
-                                extra_wait = 15
-                                logging.info(f"Adding extra {extra_wait}s wait before fallback for {ext.upper()} file...")
-                                time.sleep(extra_wait)
-
-                            fallback_success = _attempt_fallback_download(request_id, actual_run_id, device_code, ext, onc_client, args, run_info)
-                            job_succeeded = fallback_success
-                            status_info['status'] = 'Success' if fallback_success else 'Failed'
-                            status_info['reason'] = 'Fallback Attempted' + (' (Succeeded/Partial)' if fallback_success else ' (Failed)')
-                            # Update counts based on fallback result
-                            if fallback_success:
-                                files_dp_downloaded = files_dp_expected  # Assume all files were downloaded
-                                files_dp_failed = 0
-                            else:
-                                files_dp_failed = files_dp_expected
-                                files_dp_downloaded = 0
+
+                    # Step 3: Fallback for data products if needed
+                    if trigger_fallback and not job_succeeded:
+                        if actual_run_id is None:
+                            logging.error("Cannot fallback: Run ID unknown.")
                         else:
-                            logging.warning(f"Skipping fallback; status '{final_status_fb}', not COMPLETE.")
+                            logging.info(f"Checking status again before fallback for {request_id}...")
+                            final_status_fb = 'UNKNOWN'
+                            try:
+                                fb_stat = _check_data_product(onc_client, request_id)
+                                final_status_fb = _search_status(fb_stat)
+                            except Exception as e:
+                                logging.warning(f"Fallback status check failed: {e}")
+
+                            if final_status_fb in ['COMPLETE', 'COMPLETED']:
+                                logging.info(f"Proceeding with fallback for {request_id} (runId {actual_run_id}).")
+                                # MAT/PDF files can lag behind the COMPLETE status; wait (up to 15s) until they're servable
+                                if needs_longer_wait:
+                                    extra_wait = 15
+                                    logging.info(f"Waiting up to {extra_wait}s for {ext.upper()} file to be ready before fallback...")
+                                    _wait_for_product_file(onc_client, actual_run_id, extra_wait)
+
+                                fallback_success = _attempt_fallback_download(request_id, actual_run_id, device_code, ext, onc_client, args, run_info)
+                                job_succeeded = fallback_success
+                                status_info['status'] = 'Success' if fallback_success else 'Failed'
+                                status_info['reason'] = 'Fallback Attempted' + (' (Succeeded/Partial)' if fallback_success else ' (Failed)')
+                                # Update counts based on fallback result
+                                if fallback_success:
+                                    files_dp_downloaded = files_dp_expected  # Assume all files were downloaded
+                                    files_dp_failed = 0
+                                else:
+                                    files_dp_failed = files_dp_expected
+                                    files_dp_downloaded = 0
+                            else:
+                                logging.warning(f"Skipping fallback; status '{final_status_fb}', not COMPLETE.")
 
-                # Final status determination
-                if not job_succeeded and status_info['status'] not in ['Skipped', 'Failed']:
-                    status_info['status'] = 'Failed'
-                    if not status_info['reason']:
-                        status_info['reason'] = f'Processing Failed (ONC Status: {job_status_final})' if job_status_final != 'UNKNOWN' else 'Processing Failed'
-
-            except Exception as job_err:
-                logging.error(f"Unexpected error processing DP request {request_id}: {job_err}", exc_info=True)
-                status_info['status'] = 'Failed'
-                status_info['reason'] = 'Unexpected Processing Error'
-
-            # Update status info with file counts
-            status_info['details'] = {
-                'files_expected': files_dp_expected,
-                'files_downloaded': files_dp_downloaded,
-                'files_skipped': files_dp_skipped,
-                'files_failed': files_dp_failed
-            }
+                    # Final status determination
+                    if not job_succeeded and status_info['status'] not in ['Skipped', 'Failed']:
+                        status_info['status'] = 'Failed'
+                        if not status_info['reason']:
+                            status_info['reason'] = f'Processing Failed (ONC Status: {job_status_final})' if job_status_final != 'UNKNOWN' else 'Processing Failed'
 
-            # After successful download in data product section
-            if job_succeeded:
-                successful_device_downloads[device_code] = True
-
-        # === Handle Archive File Downloads (e.g., if WAV fallback to archive is needed) ===
-        elif job_type == 'archive':
-            job_status_key = f"Archive_{device_code}_{ext}"
-            print(f"\n--- Processing {job_status_key} ---")
-            archive_filters = request_info
-            files_found = 0
-            files_existing = 0
-            files_skipped = 0
-            files_downloaded = 0
-            files_failed = 0
-            listing_failed = False
-            try:
-                # 1. List files
-                logging.info(f"Listing potential archive files...")
-                try: 
-                    list_result = onc_client.getArchivefile(filters=archive_filters, allPages=True)
-                    potential_files = list_result.get("files", [])
+                except Exception as job_err:
+                    logging.error(f"Unexpected error processing DP request {request_id}: {job_err}", exc_info=debug)
+                    status_info['status'] = 'Failed'
+                    status_info['reason'] = 'Unexpected Processing Error'
+
+                # Update status info with file counts
+                status_info['details'].update(
+                    files_expected=files_dp_expected,
+                    files_downloaded=files_dp_downloaded,
+                    files_skipped=files_dp_skipped,
+                    files_failed=files_dp_failed
+                )
+
+                # After successful download in data product section
+                if job_succeeded:
+                    successful_device_downloads[device_code] = True
+
+            # === Handle Archive File Downloads (e.g., if WAV fallback to archive is needed) ===
+            elif job.kind == 'archive':
+                job_status_key = f"Archive_{device_code}_{ext}"
+                print(f"\n--- Processing {job_status_key} ---")
+                previous_files = completed_jobs.get(resume_key)
+                if previous_files and present_files.issuperset(previous_files):
+                    logging.info("✔ Already completed in a previous run (use --force to redo).")
+                    status_info['status'] = 'Success'
+                    status_info['reason'] = 'Completed Previously'
+                    status_info['details']['files_expected'] = -1 # Counts are in the earlier run's summary
+                    job_statuses[job_status_key] = status_info
+                    total_success += 1
+                    continue
+                if previous_files:
+                    logging.info("Files from a previous run of this job are missing; fetching again.")
+                archive_filters = job.payload
+                files_found = 0
+                files_existing = 0
+                files_skipped = 0
+                files_downloaded = 0
+                files_failed = 0
+                listing_failed = False
+                try:
+                    # 1. List files
+                    logging.info(f"Listing potential archive files...")
+                    try: 
+                        list_result = _cached_get_archivefile(onc_client, archive_filters, use_disk_cache=not getattr(args, 'no_cache', False))
+                        potential_files = list_result.get("files", [])
                     
-                    # Filter out -small and -thumb PNG files before counting
-                    if ext == 'png':
-                        potential_files = [f for f in potential_files if isinstance(f, dict) and 
-                                        f.get('filename') and 
-                                        not ('-small.png' in f['filename'].lower()) and 
-                                        not ('-thumb.png' in f['filename'].lower())]
+                        # Filter out -small and -thumb PNG files before counting
+                        if ext_lower == 'png':
+                            potential_files = [f for f in potential_files if isinstance(f, dict) and
+                                            f.get('filename') and
+                                            not _is_png_thumbnail(f['filename'].lower())]
                     
-                    files_found = len(potential_files)
-                    logging.info(f"Found {files_found} {'file' if files_found == 1 else 'files'}.")
+                        files_found = len(potential_files)
+                        logging.info(f"Found {files_found} {'file' if files_found == 1 else 'files'}.")
 
-                    # In test mode, print detailed file information
-                    if args.test and files_found > 0:
-                        print("\nAvailable files:")
-                        print("-" * 100)
+                        # In test mode, print detailed file information
+                        if args.test and files_found > 0:
+                            print("\nAvailable files:")
+                            print("-" * 100)
                         
-                        # Group files by extension
-                        files_by_ext = {}
-                        for file_info in potential_files:
-                            if not isinstance(file_info, dict):
-                                continue
-                            filename = file_info.get('filename')
-                            if not filename:
-                                continue
+                            # Group files (and sum their sizes) by extension in one pass
+                            # (PNG thumbnails were already filtered out above)
+                            files_by_ext = defaultdict(list)
+                            size_by_ext = defaultdict(int)
+                            for file_info in potential_files:
+                                if not isinstance(file_info, dict):
+                                    continue
+                                filename = file_info.get('filename')
+                                if not filename:
+                                    continue
                                 
-                            # Extract extension
-                            ext = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
-                            
-                            # Skip thumbnail and small versions of PNG files
-                            if ext == 'png' and ('-small.png' in filename.lower() or '-thumb.png' in filename.lower()):
-                                continue
-                                
-                            if ext not in files_by_ext:
-                                files_by_ext[ext] = []
-                            files_by_ext[ext].append(file_info)
+                                # Extract extension
+                                _, dot, ext = filename.rpartition('.')
+                                ext = ext.lower() if dot else 'unknown'
+                                files_by_ext[ext].append(file_info)
+                                size_by_ext[ext] += file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
+                            total_size = sum(size_by_ext.values())
                         
-                        # Print files grouped by extension
-                        total_size = 0
-                        for ext in sorted(files_by_ext.keys()):
-                            files = files_by_ext[ext]
-                            print(f"\n{ext.upper()} Files ({len(files)} {'file' if len(files) == 1 else 'files'} found):")
-                            print("-" * 100)
-                            ext_size = 0
-                            
-                            # Sort files by filename within each extension group
-                            sorted_files = sorted(files, key=lambda x: x.get('filename', ''))
+                            # Print files grouped by extension
+                            for ext in sorted(files_by_ext.keys()):
+                                files = files_by_ext[ext]
+                                ext_size = size_by_ext[ext]
+                                print(f"\n{ext.upper()} Files ({len(files)} {'file' if len(files) == 1 else 'files'} found):")
+                                print("-" * 100)
                             
-                            # Get size for all files in this extension group
-                            for i, file_info in enumerate(sorted_files, 1):
-                                filename = file_info.get('filename', '')
-                                file_size = file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
-                                
-                                ext_size += file_size
-                                if i <= 3:  # Only show first 3 files
-                                    print(f"{i:3d}. {filename:<75} {utils.human_size(file_size):>10}")
+                                # Only the first 3 files (by filename) are shown, so no need to sort the whole group
+                                preview = heapq.nsmallest(3, files, key=lambda x: x.get('filename', ''))
+                                for i, file_info in enumerate(preview, 1):
+                                    file_size = file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
+                                    print(f"{i:3d}. {file_info.get('filename', ''):<75} {utils.human_size(file_size):>10}")
                         
-                            if len(files) > 3:
-                                print(f"    ... and {len(files) - 3} more files ...")
+                                if len(files) > 3:
+                                    print(f"    ... and {len(files) - 3} more files ...")
                             
-                            total_size += ext_size
-                            print(f"Total {ext.upper()} size: {utils.human_size(ext_size)}")
-                        
-                        print("\n" + "-" * 100)
-                        print(f"Total size of all files: {utils.human_size(total_size)}")
-                        print("-" * 100)
-                        
-                        # Set success for test mode since we listed files
-                        job_succeeded = True
-                        status_info['status'] = 'Success'
-                        status_info['details']['total_size'] = total_size
-                        continue # Skip to next job in test mode
-
-                except requests.exceptions.HTTPError as http_err: 
-                    logging.error(f"✖ HTTP Error listing archive files: {http_err}")
-                    listing_failed = True
-                    files_failed = -1
-                except Exception as list_err: 
-                    logging.error(f"✖ Error listing archive files: {list_err}", exc_info=args.debug)
-                    listing_failed = True
-                    files_failed = -1
-
-                # 2. Process results (only if not in test mode)
-                if not listing_failed and not args.test:
-                    if files_found == 0: 
-                        status_info['status'] = 'Success'
-                        status_info['reason'] = 'No Files Found'
-                        job_succeeded = True
-                    else:
-                        # Check existing, Determine needed, Download loop...
-                        logging.info(f"Checking existing files...")
-                        # Note: We don't need to filter PNG files here anymore since potential_files is already filtered
-                        potential_filenames = []
-                        for f in potential_files:
-                            if not isinstance(f, dict):
-                                continue
-                            filename = f.get('filename')
-                            if not filename:
-                                continue
-                            potential_filenames.append(filename)
+                                print(f"Total {ext.upper()} size: {utils.human_size(ext_size)}")
                         
-                        # Now check for existing files more precisely
-                        files_to_download = []
-                        for filename in potential_filenames:
-                            file_path = output_path / filename
-                            if file_path.exists():
-                                files_existing += 1
-                                files_skipped += 1
-                            else:
-                                files_to_download.append(filename)
-
-                        logging.info(f"Need {len(files_to_download)} files. ({files_skipped} exist/skipped).")
-                        if files_to_download:
-                            logging.info("Starting archive file download...")
-                            total_dl = len(files_to_download)
-                            for i, filename in enumerate(files_to_download):
-                                try: 
-                                    dl_info = onc_client.getFile(filename=filename, overwrite=args.yes)
-                                    files_downloaded += 1
-                                except FileExistsError: 
-                                    logging.info(f"\n Skip: {filename} (Exists)")
-                                    files_skipped += 1
-                                except Exception as dl_err: 
-                                    logging.error(f"\n Fail DL {filename}: {dl_err}")
-                                    files_failed += 1
-                                finally: 
-                                    percent=(i+1)/total_dl*100
-                                    bar='#'*int(percent/5)+'-'*(20-int(percent/5))
-                                    print(f"DL [{bar}] {i+1}/{total_dl}", end='\r')
-                            print("\nDL loop finished.")
+                            print("\n" + "-" * 100)
+                            print(f"Total size of all files: {utils.human_size(total_size)}")
+                            print("-" * 100)
                         
-                        # Consider job successful if we either downloaded files or skipped them all
-                        if files_failed == 0 or files_skipped == files_found: 
+                            # Set success for test mode since we listed files
                             job_succeeded = True
                             status_info['status'] = 'Success'
-                            if files_skipped == files_found:
-                                status_info['reason'] = 'All Files Already Exist'
-                        else: 
-                            job_succeeded = False
-                            status_info['status'] = 'Failed'
-                            status_info['reason'] = 'Download Error(s)'
-                else: 
+                            status_info['details']['files_expected'] = files_found
+                            status_info['details']['total_size'] = total_size
+                            # Listing only: record the status here, leaving the run log and file organizing alone
+                            job_statuses[job_status_key] = status_info
+                            total_success += 1
+                            continue # Skip to next job in test mode
+
+                    except requests.exceptions.HTTPError as http_err: 
+                        logging.error(f"✖ HTTP Error listing archive files: {http_err}")
+                        listing_failed = True
+                        files_failed = -1
+                    except Exception as list_err: 
+                        logging.error(f"✖ Error listing archive files: {list_err}", exc_info=debug)
+                        listing_failed = True
+                        files_failed = -1
+
+                    # 2. Process results (only if not in test mode)
+                    if not listing_failed and not args.test:
+                        if files_found == 0: 
+                            status_info['status'] = 'Success'
+                            status_info['reason'] = 'No Files Found'
+                            job_succeeded = True
+                        else:
+                            # Check existing, Determine needed, Download loop...
+                            logging.info(f"Checking existing files...")
+                            # Note: We don't need to filter PNG files here anymore since potential_files is already filtered
+                            potential_filenames = [f['filename'] for f in potential_files if isinstance(f, dict) and f.get('filename')]
+
+                            # Now check for existing files with one directory read instead of a stat() per file.
+                            # A file only counts as present if it is non-empty and, when this tool downloaded it
+                            # before, still has the size recorded in the manifest; otherwise it is re-fetched.
+                            try:
+                                with os.scandir(output_path) as entries:
+                                    existing_entries = {entry.name: entry for entry in entries}
+                            except FileNotFoundError:
+                                existing_entries = {}
+                            manifest_sizes = _load_archive_manifest(output_path) if existing_entries else {}
+                            files_to_download = [] # (filename, overwrite)
+                            for filename in potential_filenames:
+                                entry = existing_entries.get(filename)
+                                if entry is None:
+                                    files_to_download.append((filename, args.yes))
+                                    continue
+                                size_on_disk = entry.stat().st_size
+                                expected_size = manifest_sizes.get(filename)
+                                if size_on_disk == 0 or (expected_size is not None and size_on_disk != expected_size):
+                                    logging.info(f"Re-downloading incomplete file: {filename} ({size_on_disk} bytes on disk)")
+                                    files_to_download.append((filename, True))
+                            # Everything not queued for download is already present
+                            files_existing = files_skipped = len(potential_filenames) - len(files_to_download)
+                            job_files = potential_filenames
+
+                            logging.info(f"Need {len(files_to_download)} files. ({files_skipped} exist/skipped).")
+                            if files_to_download:
+                                total_dl = len(files_to_download)
+                                archive_workers = max(1, getattr(args, 'archive_workers', DEFAULT_ARCHIVE_WORKERS) or DEFAULT_ARCHIVE_WORKERS)
+                                logging.info(f"Starting archive file download ({min(archive_workers, total_dl)} parallel)...")
+                                output_path.mkdir(parents=True, exist_ok=True)
+                                last_redraw = 0.0
+                                with concurrent.futures.ThreadPoolExecutor(max_workers=archive_workers) as executor, \
+                                        open(output_path / _ARCHIVE_MANIFEST_NAME, 'a') as manifest:
+                                    futures = {
+                                        executor.submit(_download_archive_file, onc_client, filename, overwrite): filename
+                                        for filename, overwrite in files_to_download
+                                    }
+                                    for i, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                                        outcome, dl_info = future.result()
+                                        if outcome == 'downloaded':
+                                            files_downloaded += 1
+                                            if isinstance(dl_info, dict) and dl_info.get('size'):
+                                                manifest.write(json.dumps({'filename': futures[future], 'size': dl_info['size']}) + "\n")
+                                        elif outcome == 'skipped':
+                                            files_skipped += 1
+                                        else:
+                                            files_failed += 1
+                                        # Redraw at most every 100ms (each print is a display update in notebooks)
+                                        now = time.monotonic()
+                                        if i == total_dl or now - last_redraw >= 0.1:
+                                            last_redraw = now
+                                            percent=i/total_dl*100
+                                            bar='#'*int(percent/5)+'-'*(20-int(percent/5))
+                                            print(f"DL [{bar}] {i}/{total_dl}", end='\r', flush=True)
+                                print("\nDL loop finished.")
+                        
+                            # Consider job successful if we either downloaded files or skipped them all
+                            if files_failed == 0 or files_skipped == files_found: 
+                                job_succeeded = True
+                                status_info['status'] = 'Success'
+                                if files_skipped == files_found:
+                                    status_info['reason'] = 'All Files Already Exist'
+                            else: 
+                                job_succeeded = False
+                                status_info['status'] = 'Failed'
+                                status_info['reason'] = 'Download Error(s)'
+                    else: 
+                        job_succeeded = False
+                        status_info['status'] = 'Failed'
+                        status_info['reason'] = 'Listing Error'
+                except Exception as arc_err: 
+                    logging.error(f"✖ Unexpected archive error: {arc_err}", exc_info=debug)
                     job_succeeded = False
                     status_info['status'] = 'Failed'
-                    status_info['reason'] = 'Listing Error'
-            except Exception as arc_err: 
-                logging.error(f"✖ Unexpected archive error: {arc_err}", exc_info=args.debug)
-                job_succeeded = False
-                status_info['status'] = 'Failed'
-                status_info['reason'] = 'Unexpected Error'
-            status_info['details'] = {
-                'files_expected': files_found,
-                'files_downloaded': files_downloaded,
-                'files_skipped': files_skipped,
-                'files_failed': files_failed
-            }
-
-            # After successful download in archive section
-            if job_succeeded:
-                successful_device_downloads[device_code] = True
-
-        # Store job status and update overall success
-        job_statuses[job_status_key] = status_info
-        if status_info['status'] == 'Failed':
-            all_jobs_overall_success = False
-            total_failure += 1
-        elif status_info['status'] == 'Skipped':
-            total_skipped += 1
-        else:
-            total_success += 1
+                    status_info['reason'] = 'Unexpected Error'
+                status_info['details'].update(
+                    files_expected=files_found,
+                    files_downloaded=files_downloaded,
+                    files_skipped=files_skipped,
+                    files_failed=files_failed
+                )
+
+                # After successful download in archive section
+                if job_succeeded:
+                    successful_device_downloads[device_code] = True
+
+            # Store job status and update overall success
+            job_statuses[job_status_key] = status_info
+            try:
+                output_path.mkdir(parents=True, exist_ok=True)
+                with open(run_log_path, 'a') as run_log:
+                    run_log.write(json.dumps({
+                        'key': job_status_key,
+                        # Only jobs that actually have files on disk can be resumed
+                        'resume_key': resume_key if job_files and status_info['details'].get('files_failed') == 0 else None,
+                        'files': job_files,
+                        'status': status_info['status'],
+                        'details': status_info['details'],
+                        'ts': time.time(),
+                    }) + "\n")
+            except OSError as log_err:
+                logging.debug(f"Could not update run log {run_log_path}: {log_err}")
+            if status_info['status'] == 'Failed':
+                all_jobs_overall_success = False
+                total_failure += 1
+            elif status_info['status'] == 'Skipped':
+                total_skipped += 1
+            else:
+                total_success += 1
+    finally:
+        if run_executor:
+            # Don't leave queued runs behind if a job raised or the user interrupted
+            for fut in run_futures.values():
+                fut.cancel()
+            run_executor.shutdown(wait=False)
 
     # After all jobs complete, organize files for devices with successful downloads
     for device_code in successful_device_downloads:
@@ -1460,24 +1931,35 @@ def process_download_jobs(
     print("\n==============================")
     print("Processing Summary:")
     print("------------------------------")
+    totals = Counter()
     for job_key, info in job_statuses.items():
         status_emoji = '✅' if info['status'] == 'Success' else ('⚠️' if info['status'] == 'Skipped' else '❌')
         print(f"{status_emoji} {job_key}: {info['status']}" + (f" ({info['reason']})" if info['reason'] else ""))
         details = info['details']
-        if details:
-            counts_str = []
-            if details['files_expected'] >= 0:
-                counts_str.append(f"Files Expected: {details['files_expected']}")
-                if details['files_skipped'] > 0:
-                    counts_str.append(f"Skipped (Already Exist): {details['files_skipped']}")
-                elif details['files_downloaded'] > 0:
-                    counts_str.append(f"Downloaded: {details['files_downloaded']}")
-                if details['files_failed'] > 0:
-                    counts_str.append(f"Failed: {details['files_failed']}")
-            if counts_str:
-                print(f"     └─ {', '.join(counts_str)}")
+        if not details:
+            continue
+        expected = details.get('files_expected', -1)
+        if expected < 0:
+            continue
+        skipped = details.get('files_skipped', 0)
+        downloaded = details.get('files_downloaded', 0)
+        failed = details.get('files_failed', 0)
+        # Negative counts mark "unknown" (e.g. listing failed); keep them out of the totals
+        totals.update(expected=expected, skipped=max(skipped, 0), downloaded=max(downloaded, 0), failed=max(failed, 0))
+
+        counts_str = f"Files Expected: {expected}"
+        if skipped > 0:
+            counts_str += f", Skipped (Already Exist): {skipped}"
+        elif downloaded > 0:
+            counts_str += f", Downloaded: {downloaded}"
+        if failed > 0:
+            counts_str += f", Failed: {failed}"
+        print(f"     └─ {counts_str}")
 
     print("------------------------------")
+    if totals:
+        print(f"Files: {totals['expected']} expected, {totals['downloaded']} downloaded, "
+              f"{totals['skipped']} skipped, {totals['failed']} failed")
     print(f"⚠ Processing finished with {total_success} success(es), {total_failure} failure(s), {total_skipped} skipped.")
     print(f"Downloaded files location: {output_path}")
 
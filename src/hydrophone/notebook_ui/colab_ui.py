@@ -3,22 +3,27 @@ Interactive UI module for Google Colab integration with the hydrophone data requ
 """
 
 import ipywidgets as widgets
+from IPython import get_ipython
 from IPython.display import display, clear_output, HTML
 from datetime import datetime, time
+import asyncio
+import concurrent.futures
+import functools
+import importlib.util
 import logging
 import sys
 import os
 import re
-import pytz  # For comprehensive timezone list
-from collections import defaultdict
-from dateutil.tz import gettz, UTC
+try:
+    from zoneinfo import available_timezones  # Python 3.9+
+except ImportError:
+    available_timezones = None
+from collections import Counter, defaultdict
+from itertools import chain
+from dateutil.tz import UTC
+from time import monotonic
 import traceback  # Add import for better error logging
 
-# Ensure src directory is in path for imports
-src_path = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-if src_path not in sys.path:
-    sys.path.insert(0, src_path)
-
 # Import project modules
 from hydrophone.core import onc_client as onc
 from hydrophone.core import downloader as core_downloader
@@ -30,39 +35,64 @@ from hydrophone.utils.exceptions import (
 from hydrophone.config import settings
 from hydrophone.core.onc_client import ONC
 
-# Import files module for download helpers if needed later
+# Detect Colab without importing google.colab (the Colab kernel has already loaded it)
 try:
-    from google.colab import drive, files
-    COLAB_ENV = True
+    COLAB_ENV = 'google.colab' in sys.modules or importlib.util.find_spec('google.colab') is not None
 except ImportError:
     COLAB_ENV = False
 
-# Import FileChooser and its utilities
-try:
-    from ipyfilechooser import FileChooser
-    from ipyfilechooser.utils import InvalidPathError
-    FILECHOOSER_AVAILABLE = True
-except ImportError:
-    FileChooser = None
-    InvalidPathError = None
-    FILECHOOSER_AVAILABLE = False
-    print("WARNING: 'ipyfilechooser' not found. Drive folder picker will not be available. Install with: pip install ipyfilechooser", file=sys.stderr)
+
+@functools.lru_cache(maxsize=None)
+def _load_file_chooser():
+    """
+    Imports ipyfilechooser on first use (only needed for the Drive folder picker).
+    Returns (FileChooser, InvalidPathError), or (None, None) if it isn't installed.
+    """
+    try:
+        from ipyfilechooser import FileChooser
+        from ipyfilechooser.utils import InvalidPathError
+        return FileChooser, InvalidPathError
+    except ImportError:
+        print("WARNING: 'ipyfilechooser' not found. Drive folder picker will not be available. Install with: pip install ipyfilechooser", file=sys.stderr)
+        return None, None
 
 # --- Constants ---
-DEFAULT_TIMEZONES = [
+_PRIORITY_TIMEZONES = (
     'UTC', 'America/Vancouver', 'America/Toronto', 'America/New_York',
     'Europe/London', 'Europe/Berlin', 'Asia/Tokyo', 'Australia/Sydney'
-] + sorted([tz for tz in pytz.common_timezones if '/' in tz and tz not in [
-    'UTC', 'America/Vancouver', 'America/Toronto', 'America/New_York', 
-    'Europe/London', 'Europe/Berlin', 'Asia/Tokyo', 'Australia/Sydney'
-]])
+)
+_PRIORITY_TZ_SET = frozenset(_PRIORITY_TIMEZONES)
+# Zone families that aren't useful as a "local timezone" choice
+_EXCLUDED_TZ_PREFIXES = ('Etc/', 'posix/', 'right/', 'SystemV/')
+
+
+def _region_timezones():
+    """Region/City zone names from the system tz database (pytz on Pythons without zoneinfo)."""
+    zones = available_timezones() if available_timezones else set()
+    if not zones:
+        import pytz  # Python < 3.9, or no system tz database
+        zones = pytz.common_timezones
+    return {tz for tz in zones if '/' in tz and not tz.startswith(_EXCLUDED_TZ_PREFIXES)}
+
+
+DEFAULT_TIMEZONES = list(_PRIORITY_TIMEZONES) + sorted(_region_timezones() - _PRIORITY_TZ_SET)
+
+# Time-of-day input: H:MM or HH:MM, 24-hour clock
+_HHMM_RE = re.compile(r'([01]?\d|2[0-3]):([0-5]\d)$')
+
+# Device code at the end of a device option label, e.g. "Hydrophone (ICLISTENHF1234)"
+_DEVICE_CODE_RE = re.compile(r'\(([^)]+)\)$')
+
+# Discovery makes several blocking ONC calls; run it off the kernel thread
+_DISCOVERY_EXECUTOR = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="hydrophone-discover")
 
 # Google Drive Mount Path
 DRIVE_MOUNT_PATH = '/content/drive'
 DRIVE_MYDRIVE_PATH = os.path.join(DRIVE_MOUNT_PATH, 'MyDrive')
 
 # --- Add CSS for spinner animation ---
-display(HTML("""
+# Module globals survive importlib.reload(), so re-running the import cell doesn't stack <style> tags
+_SPINNER_CSS = """
 <style>
 /* Give every <i class="fa fa-spinner"> inside a .loading class a spin */
 .loading i.fa-spinner {
@@ -73,7 +103,10 @@ display(HTML("""
   100% { transform: rotate(360deg); }
 }
 </style>
-"""))
+"""
+if not globals().get('_css_injected'):
+    display(HTML(_SPINNER_CSS))
+    _css_injected = True
 
 # --- Widget Definitions ---
 
@@ -150,6 +183,12 @@ w_zip_output = widgets.Checkbox(
     indent=True,
     layout=widgets.Layout(width='auto')
 )
+w_force = widgets.Checkbox(
+    description='Redo archive files completed by a previous run',
+    value=False,
+    indent=True,
+    layout=widgets.Layout(width='auto')
+)
 
 # Action Buttons
 w_discover_btn = widgets.Button(
@@ -214,23 +253,56 @@ state = {
     "onc_service": None,  # Store initialized client
     "deployments": [],
     "location_map": {},
-    "parent_loc_choices": [],
-    "parent_loc_codes": [],
+    "parent_loc_choices": [],  # [(display_string, parent_code)] options for w_location_select
     "parent_choice_details": {},
     "devices_at_selected_location": {},
     "selected_parent_code": None,
     "available_products": {},  # {ext: [product_dict]} - Used for Data Product Mode
+    "products_by_code": {},  # {(ext, dataProductCode): product_dict} - index into available_products
     "available_archive_files": [],  # List of file info dicts - Used for Archive Mode
     "product_checkboxes": {},  # {(prod_code, ext): checkbox_widget}
     "archive_checkboxes": {},  # {ext: checkbox_widget}
     "chosen_deployments": [],
     "all_params": {},
     "drive_file_chooser_instance": None,  # Store the instance if created
+    "notebook_log_handler": None,  # OutputWidgetHandler attached by the last download run
     "preloaded_device_files": {},  # Store device file availability info: {device_code: has_files}
     "preloaded_device_names": {}  # Store device names: {device_code: device_name}
 }
 
 # --- Helper Functions ---
+_log_handler = None  # Root stdout handler installed by _configure_logging
+
+
+def _configure_logging(debug):
+    """
+    Routes the package's (root-logger) messages to stdout at INFO or DEBUG.
+    The handler is created once and re-attached if a download run detached it;
+    other root handlers are left alone.
+    """
+    global _log_handler
+    root = logging.getLogger()
+    if _log_handler is None:
+        _log_handler = logging.StreamHandler(sys.stdout)
+        _log_handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    if _log_handler not in root.handlers:
+        root.addHandler(_log_handler)
+    root.setLevel(logging.DEBUG if debug else logging.INFO)
+
+_DRIVE_MOUNT_TTL = 5.0  # seconds a Drive mount probe stays valid
+_drive_mount_probe = (float('-inf'), False)  # (monotonic time, mounted)
+
+
+def _drive_mounted():
+    """Whether the Drive MyDrive folder exists, re-probed at most every few seconds."""
+    global _drive_mount_probe
+    checked_at, mounted = _drive_mount_probe
+    now = monotonic()
+    if now - checked_at >= _DRIVE_MOUNT_TTL:
+        mounted = os.path.isdir(DRIVE_MYDRIVE_PATH)
+        _drive_mount_probe = (now, mounted)
+    return mounted
+
 def _get_datetime_from_widgets(date_widget, time_widget, tz_widget):
     """Combines date and time widgets into a timezone-aware datetime."""
     date_val = date_widget.value
@@ -244,33 +316,30 @@ def _get_datetime_from_widgets(date_widget, time_widget, tz_widget):
         show_status("✖ Please select a timezone.", target='discover', error=True)
         return None
 
-    local_zone = gettz(tz_str)
+    local_zone = utils.get_zone(tz_str)
     if local_zone is None:
         show_status(f"✖ Invalid timezone: {tz_str}", target='discover', error=True)
         return None
 
-    try:
-        hour, minute = map(int, time_str.split(':'))
-        if not (0 <= hour <= 23 and 0 <= minute <= 59):
-            raise ValueError("Time out of range")
-        dt_naive = datetime.combine(date_val, time(hour, minute))
-        dt_aware = dt_naive.replace(tzinfo=local_zone)
-        return dt_aware
-    except Exception as e:
-        show_status(f"✖ Invalid time format '{time_str}'. Use HH:MM. Error: {e}", target='discover', error=True)
+    match = _HHMM_RE.match(time_str.strip())
+    if not match:
+        show_status(f"✖ Invalid time '{time_str}'. Use HH:MM (00:00-23:59).", target='discover', error=True)
         return None
+    dt_naive = datetime.combine(date_val, time(int(match.group(1)), int(match.group(2))))
+    return dt_naive.replace(tzinfo=local_zone)
 
 def _set_button_state(btn, *, working):
     """Flip a single button between idle and 'working'."""
-    if working:
-        btn.add_class('loading')
-        btn.icon = 'spinner'                 # plain FA name
-        btn.disabled = True                  # grey-out *but* keep label
-    else:
-        btn.remove_class('loading')
-        # restore each button's own idle icon
-        btn.icon = 'search' if btn is w_discover_btn else 'download'
-        btn.disabled = False
+    with btn.hold_sync():
+        if working:
+            btn.add_class('loading')
+            btn.icon = 'spinner'                 # plain FA name
+            btn.disabled = True                  # grey-out *but* keep label
+        else:
+            btn.remove_class('loading')
+            # restore each button's own idle icon
+            btn.icon = 'search' if btn is w_discover_btn else 'download'
+            btn.disabled = False
 
 def show_status(message, *, target='status', working=False, error=False):
     """
@@ -327,6 +396,7 @@ def _toggle_widgets(disabled: bool):
     w_fetch_sensitivity.disabled = disabled
     w_debug.disabled = disabled
     w_debug_net.disabled = disabled
+    w_force.disabled = disabled
 
     # Buttons
     w_discover_btn.disabled = disabled
@@ -339,36 +409,34 @@ def _toggle_widgets(disabled: bool):
     # Device multiselect only enabled if location selected AND not processing
     w_device_select.disabled = disabled or not state.get("selected_parent_code")
 
-    # Dynamic areas: Disable all child interactives if processing
-    for area in [w_product_selection_area, w_archive_selection_area]:
-        for w in area.children:
-            # Handle Accordion children specifically
-            if isinstance(w, widgets.Accordion):
-                for child_vbox in w.children:
-                    for checkbox in child_vbox.children:
-                        checkbox.disabled = disabled
-            elif hasattr(w, 'disabled'):  # Handle Checkboxes, Buttons etc.
-                w.disabled = disabled
+    # Dynamic areas: every product/archive checkbox is registered in state when it is created
+    for checkboxes in (state.get("product_checkboxes") or {}, state.get("archive_checkboxes") or {}):
+        for checkbox in checkboxes.values():
+            checkbox.disabled = disabled
 
     # Also disable FileChooser when processing
     fc_instance = state.get("drive_file_chooser_instance")
-    if FILECHOOSER_AVAILABLE and isinstance(fc_instance, FileChooser):
+    if fc_instance is not None:
         fc_instance.disabled = disabled
 
 def _build_product_selection_ui(available_products):
     """Dynamically creates product selection widgets (Checkboxes in Accordion)."""
     state["product_checkboxes"] = {}  # Clear previous
-    accordion_children = []
     sorted_exts = sorted(available_products.keys())
 
     if not sorted_exts:
         w_product_archive_label.value = "<i>No specific data products found for this device/time.</i>"
-        return []
+        return ()
+
+    # Panels start empty; a panel's checkboxes are only created when it is first opened
+    accordion_children = [widgets.VBox() for _ in sorted_exts]
 
-    for ext in sorted_exts:
-        products = available_products[ext]
+    def materialize_panel(index):
+        if index is None or accordion_children[index].children:
+            return
+        ext = sorted_exts[index]
         ext_checkboxes = []
-        for p_dict in products:
+        for p_dict in available_products[ext]:
             prod_code = p_dict.get('dataProductCode', 'N/A')
             prod_name = p_dict.get('dataProductName', 'Unknown')
             cb = widgets.Checkbox(
@@ -379,84 +447,77 @@ def _build_product_selection_ui(available_products):
             )
             state["product_checkboxes"][(prod_code, ext)] = cb
             ext_checkboxes.append(cb)
-        ext_vbox = widgets.VBox(ext_checkboxes)
-        accordion_children.append(ext_vbox)
+        accordion_children[index].children = ext_checkboxes
 
     accordion = widgets.Accordion(
         children=accordion_children,
         layout=widgets.Layout(width='95%')  # Accordion width
     )
-    for i, ext in enumerate(sorted_exts):
-        accordion.set_title(i, f"{ext.upper()} Products ({len(available_products[ext])})")
+    with accordion.hold_sync(): # Send all section titles in one message
+        for i, ext in enumerate(sorted_exts):
+            accordion.set_title(i, f"{ext.upper()} Products ({len(available_products[ext])})")
+    accordion.observe(lambda change: materialize_panel(change['new']), names='selected_index')
+    materialize_panel(accordion.selected_index) # Older ipywidgets open the first panel by default
 
     w_product_archive_label.value = "<b>2c. Select Data Products:</b>"
-    return [accordion]
+    return (accordion,)
 
 def _build_archive_selection_ui(archive_files_info):
     """Dynamically creates archive file type selection widgets."""
     state["archive_checkboxes"] = {}  # Clear previous
-    files_by_ext = defaultdict(lambda: {'count': 0, 'size': 0, 'filenames': []})
-    total_files = 0
-    total_size = 0
+    counts_by_ext = Counter()
+    sizes_by_ext = Counter()
 
     for file_info in archive_files_info:
         if not isinstance(file_info, dict): continue
         filename = file_info.get('filename')
         if not filename: continue
+        filename_lower = filename.lower()
 
         # Filter out thumbs/small PNGs
-        is_png = '.png' in filename.lower()
-        is_thumb_small = is_png and ('-small.png' in filename.lower() or '-thumb.png' in filename.lower())
-        if is_thumb_small: continue
-
-        total_files += 1
-        file_size = file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
-        total_size += file_size
-        ext = filename.split('.')[-1].lower() if '.' in filename else 'unknown'
+        if onc._is_png_thumbnail(filename_lower): continue
 
-        files_by_ext[ext]['count'] += 1
-        files_by_ext[ext]['size'] += file_size
-        if len(files_by_ext[ext]['filenames']) < 3:
-            files_by_ext[ext]['filenames'].append(filename)
+        _, dot, ext = filename_lower.rpartition('.')
+        ext = ext if dot else 'unknown'
+        counts_by_ext[ext] += 1
+        sizes_by_ext[ext] += file_info.get('uncompressedFileSize', file_info.get('fileSize', 0))
 
-    if not files_by_ext:
+    if not counts_by_ext:
         w_product_archive_label.value = "<i>No downloadable archive files found for this device/time.</i>"
-        return []
+        return ()
 
+    total_files = sum(counts_by_ext.values())
+    total_size = sum(sizes_by_ext.values())
     w_product_archive_label.value = f"<b>2c. Select Archive File Types ({total_files} files, {utils.human_size(total_size)} total):</b>"
     
-    archive_widgets = []
-    sorted_exts = sorted(files_by_ext.keys())
-
-    for ext in sorted_exts:
-        info = files_by_ext[ext]
-        cb = widgets.Checkbox(
-            description=f"{ext.upper()} Files ({info['count']}, {utils.human_size(info['size'])})",
+    for ext in sorted(counts_by_ext):
+        state["archive_checkboxes"][ext] = widgets.Checkbox(
+            description=f"{ext.upper()} Files ({counts_by_ext[ext]}, {utils.human_size(sizes_by_ext[ext])})",
             value=False,
             indent=True,
             layout=widgets.Layout(width='auto')  # Allow natural width
         )
-        state["archive_checkboxes"][ext] = cb
-        archive_widgets.append(cb)
 
-    return archive_widgets
+    return tuple(state["archive_checkboxes"].values())
 
 def _prepare_parent_location_choices(deployments, loc_map, onc_service=None, start_dt=None, end_dt=None, is_archive=False):
-    """Helper to group deployments and format choices for the location selector."""
-    by_parent_loc = defaultdict(list)
-    parent_codes_found = set()
+    """Helper to group deployments and build (label, parent_code) options for the location selector."""
+    # One pass: deployments per parent location, and those deployments indexed by device code
+    by_parent_loc = {}
     for d in deployments:
         loc_code_from_dep = d.get('locationCode')
         if not loc_code_from_dep:
             continue
-        parent_code = loc_code_from_dep.split('.')[0]
-        by_parent_loc[parent_code].append(d)
-        parent_codes_found.add(parent_code)
+        bucket = by_parent_loc.setdefault(loc_code_from_dep.partition('.')[0], {'deps': [], 'devices': {}})
+        bucket['deps'].append(d)
+        device_code = d.get('deviceCode')
+        if device_code:
+            bucket['devices'].setdefault(device_code, []).append(d)
 
     if not by_parent_loc:
         raise NoDataError("No processable locations found in deployments.")
 
-    sorted_parent_codes = sorted(list(parent_codes_found))
+    sorted_parent_codes = sorted(by_parent_loc)
     parent_loc_choices = []
     parent_choice_details = {}
     GENERIC_LOC_MAP_NAMES = {"Hydrophone Array - Box Type", "Underwater Network"}
@@ -468,19 +529,18 @@ def _prepare_parent_location_choices(deployments, loc_map, onc_service=None, sta
         state["preloaded_device_files"].clear()  # Clear previous preloaded data
         state["preloaded_device_names"].clear()
         
-        print("Pre-loading device information...")
+        w_output_area.append_stdout("Pre-loading device information...\n")
         # Collect all unique device codes and names
         all_device_codes = []
         for parent_code in sorted_parent_codes:
-            deployments_at_parent = by_parent_loc[parent_code]
-            for dep in deployments_at_parent:
+            for dep in by_parent_loc[parent_code]['deps']:
                 device_code = dep.get('deviceCode')
                 device_name = dep.get('deviceName', 'Unknown Device')
                 if device_code and device_code not in state["preloaded_device_names"]:
                     all_device_codes.append(device_code)
                     state["preloaded_device_names"][device_code] = device_name
         
-        print(f"Checking {len(all_device_codes)} unique devices for available files...")
+        w_output_area.append_stdout(f"Checking {len(all_device_codes)} unique devices for available files...\n")
         
         # Use parallel processing to check files
         from hydrophone.utils.parallel import check_archive_files_parallel
@@ -490,7 +550,8 @@ def _prepare_parent_location_choices(deployments, loc_map, onc_service=None, sta
             start_dt.astimezone(UTC),
             end_dt.astimezone(UTC),
             max_workers=10,  # Adjust based on API limits
-            debug=state['all_params'].get('debug', False)
+            debug=state['all_params'].get('debug', False),
+            write=w_output_area.append_stdout
         )
         
         # Update state and determine locations with files
@@ -498,61 +559,45 @@ def _prepare_parent_location_choices(deployments, loc_map, onc_service=None, sta
         
         # Determine which locations have files
         for parent_code in sorted_parent_codes:
-            deployments_at_parent = by_parent_loc[parent_code]
-            for dep in deployments_at_parent:
-                device_code = dep.get('deviceCode')
-                if device_code and device_has_files.get(device_code, False):
-                    locations_with_files.add(parent_code)
-                    break
+            if any(device_has_files.get(code, False) for code in by_parent_loc[parent_code]['devices']):
+                locations_with_files.add(parent_code)
         
-        print("\nDevice information pre-loading complete.")
+        w_output_area.append_stdout("\nDevice information pre-loading complete.\n")
                     
         # Update sorted_parent_codes to only include locations with files
-        if locations_with_files:
-            sorted_parent_codes = sorted(list(locations_with_files))
-        else:
-            sorted_parent_codes = []
+        sorted_parent_codes = [code for code in sorted_parent_codes if code in locations_with_files]
 
     for parent_code in sorted_parent_codes:
-        display_name = None
-        deployments_at_parent = by_parent_loc[parent_code]
+        deployments_at_parent = by_parent_loc[parent_code]['deps']
+        deployments_by_code = by_parent_loc[parent_code]['devices']
         first_deployment = deployments_at_parent[0] if deployments_at_parent else None
 
         # Naming Logic
         parent_map_name = loc_map.get(parent_code)
-        is_generic_from_map = bool(parent_map_name and parent_map_name in GENERIC_LOC_MAP_NAMES)
-
-        if parent_map_name and not is_generic_from_map:
-            display_name = parent_map_name
-        elif first_deployment:
-            citation_text = first_deployment.get('citation', {}).get('citation')
-            citation_name = onc._extract_name_from_citation(citation_text)
-            if citation_name:
-                display_name = citation_name
-
-        if display_name is None:
-            display_name = parent_map_name if is_generic_from_map else parent_code
+        display_name = None if parent_map_name in GENERIC_LOC_MAP_NAMES else parent_map_name
+        if not display_name and first_deployment:
+            citation_text = (first_deployment.get('citation') or {}).get('citation')
+            display_name = onc._extract_name_from_citation(citation_text)
+        display_name = display_name or parent_map_name or parent_code
 
-        # Get Device List
-        device_codes_only = set(dep.get('deviceCode') for dep in deployments_at_parent if dep.get('deviceCode'))
-        
         # In archive mode, only count devices with files
         if is_archive:
-            device_count = sum(1 for code in device_codes_only if state["preloaded_device_files"].get(code, False))
+            device_count = sum(1 for code in deployments_by_code if state["preloaded_device_files"].get(code, False))
         else:
-            device_count = len(device_codes_only)
+            device_count = len(deployments_by_code)
             
         device_list_str = f" (Devs: {device_count})" if device_count else ""
 
         parent_choice_details[parent_code] = {
             'display_name': display_name,
             'all_deployments': deployments_at_parent,
-            'device_codes': sorted(list(device_codes_only))
+            'deployments_by_code': deployments_by_code,  # {device_code: [deployments]}
+            'device_codes': sorted(deployments_by_code)
         }
         final_choice_string = f"{display_name} [{parent_code}]{device_list_str}"
-        parent_loc_choices.append(final_choice_string)
+        parent_loc_choices.append((final_choice_string, parent_code))
 
-    return parent_loc_choices, sorted_parent_codes, parent_choice_details
+    return parent_loc_choices, parent_choice_details
 
 # --- Widget Callbacks ---
 def on_discover_button_clicked(b):
@@ -570,11 +615,11 @@ def on_discover_button_clicked(b):
         "deployments": [],
         "location_map": {},
         "parent_loc_choices": [],
-        "parent_loc_codes": [],
         "parent_choice_details": {},
         "devices_at_selected_location": {},
         "selected_parent_code": None,
         "available_products": {},
+        "products_by_code": {},
         "available_archive_files": [],
         "product_checkboxes": {},
         "archive_checkboxes": {},
@@ -585,6 +630,7 @@ def on_discover_button_clicked(b):
     })
     w_output_area.clear_output(wait=True)
 
+    handed_off = False
     try:
         with w_output_area:
             print("--- Discovering Deployments ---")
@@ -596,7 +642,7 @@ def on_discover_button_clicked(b):
             if target_type == 'Google Drive':
                 # Check if FileChooser instance exists and has a path selected
                 fc_instance = state.get("drive_file_chooser_instance")
-                if FILECHOOSER_AVAILABLE and isinstance(fc_instance, FileChooser):
+                if fc_instance is not None:
                     selected_drive_path = fc_instance.selected_path
                     if not selected_drive_path:
                         show_status("✖ Google Drive selected, but no folder chosen in the picker.", target='discover', error=True)
@@ -644,34 +690,99 @@ def on_discover_button_clicked(b):
             if not start_dt or not end_dt: _toggle_widgets(False); _set_button_state(w_discover_btn, working=False); return
             if end_dt <= start_dt: show_status("✖ End date/time must be after start.", target='discover', error=True); _toggle_widgets(False); _set_button_state(w_discover_btn, working=False); return
 
-            state['all_params'] = {'token': token, 'start_dt': start_dt, 'end_dt': end_dt, 'tz': tz_str, 'output': output_dir, 'archive': is_archive, 'test': is_test, 'fetch_sensitivity': w_fetch_sensitivity.value, 'debug': w_debug.value or w_debug_net.value, 'debug_net': w_debug_net.value, 'yes': True, 'fallback_retries': 12, 'fallback_wait': 5.0,}
-            log_level = logging.DEBUG if state['all_params']['debug'] else logging.INFO; logging.basicConfig(level=log_level, format='%(levelname)s: %(message)s', stream=sys.stdout, force=True)
-
-            # 2. Initialize ONC Client
-            print(f"Output target: {output_dir}") # Show final path
-            print("Connecting to ONC..."); show_status("Connecting to ONC...", target='discover', working=True)
-            onc_service = ONC(token, outPath=output_dir, showInfo=state['all_params']['debug_net'], timeout=settings.DEFAULT_ONC_TIMEOUT)
-            onc_service.getLocations({}); state["onc_service"] = onc_service; print("Connection successful.")
-
-            # 3. Find Deployments
-            print("Finding overlapping deployments..."); show_status("Finding deployments...", target='discover', working=True)
-            fake_args = type('obj', (object,), state['all_params'])()
-            start_utc = start_dt.astimezone(UTC); end_utc = end_dt.astimezone(UTC)
-            deployments, loc_map = onc.find_overlapping_deployments(onc_service, start_utc, end_utc, fake_args)
-            state['deployments'] = deployments; state['location_map'] = loc_map
-            print(f"Found {len(deployments)} potentially relevant deployment(s).")
-            if not deployments: show_status("No overlapping deployments found.", target='discover', error=False); _toggle_widgets(False); _set_button_state(w_discover_btn, working=False); return
-
-            # 4. Populate Location Selector
-            parent_choices, parent_codes, parent_details = _prepare_parent_location_choices(deployments, loc_map, onc_service, start_dt, end_dt, is_archive)
-            state["parent_loc_choices"] = parent_choices; state["parent_loc_codes"] = parent_codes
-            state["parent_choice_details"] = parent_details; w_location_select.options = parent_choices
-            w_location_select.disabled = False; print("\n== Please select a Parent Location below ==")
-            show_status("Discovery complete. Select Location.", target='discover', working=False)
+            state['all_params'] = {'token': token, 'start_dt': start_dt, 'end_dt': end_dt, 'tz': tz_str, 'output': output_dir, 'archive': is_archive, 'test': is_test, 'fetch_sensitivity': w_fetch_sensitivity.value, 'debug': w_debug.value or w_debug_net.value, 'debug_net': w_debug_net.value, 'yes': True, 'fallback_retries': settings.DEFAULT_FALLBACK_RETRIES, 'fallback_wait': settings.DEFAULT_FALLBACK_WAIT_SECONDS,}
+            _configure_logging(state['all_params']['debug'])
+
+            # 2-4. The ONC calls run on a worker thread so the kernel stays responsive; their
+            # logs go to the output area, and the result is applied back on the kernel's event loop
+            show_status("Connecting to ONC...", target='discover', working=True)
+            log_handler = _attach_discovery_log_handler()
+            schedule = _kernel_loop_scheduler()
+            fut = _DISCOVERY_EXECUTOR.submit(_run_discovery, token, output_dir, start_dt, end_dt, is_archive)
+            fut.add_done_callback(lambda f: schedule(_apply_discovery_result, f, log_handler))
+            handed_off = True
 
     except NoDataError as e: show_status(f"ℹ️ {e}", target='discover', error=False)
     except Exception as e: show_status(f"✖ Discovery Error: {e}", target='discover', error=True); logging.exception("Discovery error:")
     finally:
+        if not handed_off: # Otherwise _apply_discovery_result restores the UI when it finishes
+            _toggle_widgets(False) # Re-enable widgets
+            _set_button_state(w_discover_btn, working=False) # Ensure button state is idle
+            w_download_btn.disabled = True # Keep download disabled
+
+def _run_discovery(token, output_dir, start_dt, end_dt, is_archive):
+    """
+    Connects to ONC, finds deployments and prepares the location choices (runs on _DISCOVERY_EXECUTOR).
+    Touches no widgets beyond appending text to the output area; _apply_discovery_result shows the result.
+    """
+    # 2. Initialize ONC Client
+    w_output_area.append_stdout(f"Output target: {output_dir}\nConnecting to ONC...\n") # Show final path
+    onc_service = ONC(token, outPath=output_dir, showInfo=state['all_params']['debug_net'], timeout=settings.DEFAULT_ONC_TIMEOUT)
+    onc._cached_get_locations(onc_service, use_disk_cache=not state['all_params'].get('no_cache', False))
+    w_output_area.append_stdout("Connection successful.\n")
+
+    # 3. Find Deployments
+    w_output_area.append_stdout("Finding overlapping deployments...\n")
+    fake_args = type('obj', (object,), state['all_params'])()
+    start_utc = start_dt.astimezone(UTC); end_utc = end_dt.astimezone(UTC)
+    deployments, loc_map = onc.find_overlapping_deployments(onc_service, start_utc, end_utc, fake_args, progress_write=w_output_area.append_stdout)
+    w_output_area.append_stdout(f"Found {len(deployments)} potentially relevant deployment(s).\n")
+    if not deployments:
+        return onc_service, deployments, loc_map, None
+
+    # 4. Prepare Location Choices
+    choices = _prepare_parent_location_choices(deployments, loc_map, onc_service, start_dt, end_dt, is_archive)
+    return onc_service, deployments, loc_map, choices
+
+def _kernel_loop_scheduler():
+    """
+    Returns a thread-safe schedule(fn, *args) that runs fn on the kernel's event loop, where widget
+    updates belong. Must be called from the kernel thread; outside a kernel it calls fn directly.
+    """
+    kernel = getattr(get_ipython(), 'kernel', None)
+    if getattr(kernel, 'io_loop', None) is not None:
+        return kernel.io_loop.add_callback
+    try:
+        return asyncio.get_running_loop().call_soon_threadsafe
+    except RuntimeError:
+        return lambda fn, *args: fn(*args)
+
+def _attach_discovery_log_handler():
+    """Sends root-logger output to the output area while discovery runs on its worker thread."""
+    root = logging.getLogger()
+    if _log_handler is not None:
+        root.removeHandler(_log_handler)  # Its stdout would land in whichever cell ran last
+    handler = core_downloader.OutputWidgetHandler(w_output_area)
+    handler.setFormatter(logging.Formatter('%(levelname)s: %(message)s'))
+    root.addHandler(handler)
+    return handler
+
+def _apply_discovery_result(fut, log_handler):
+    """
+    Applies a finished _run_discovery (scheduled onto the kernel's event loop): stores its results,
+    populates the location selector and hands logging back to the stdout handler.
+    """
+    try:
+        onc_service, deployments, loc_map, choices = fut.result()
+        state["onc_service"] = onc_service
+        state['deployments'] = deployments; state['location_map'] = loc_map
+        if choices is None: show_status("No overlapping deployments found.", target='discover', error=False); return
+
+        parent_choices, parent_details = choices
+        state["parent_loc_choices"] = parent_choices
+        state["parent_choice_details"] = parent_details
+        with w_location_select.hold_sync(): # One front-end update for options + enabled state
+            w_location_select.options = parent_choices
+            w_location_select.disabled = False
+        w_output_area.append_stdout("\n== Please select a Parent Location below ==\n")
+        show_status("Discovery complete. Select Location.", target='discover', working=False)
+
+    except NoDataError as e: show_status(f"ℹ️ {e}", target='discover', error=False)
+    except Exception as e: show_status(f"✖ Discovery Error: {e}", target='discover', error=True); logging.error("Discovery error:", exc_info=e)
+    finally:
+        logging.getLogger().removeHandler(log_handler)
+        log_handler.close()
+        _configure_logging(state['all_params']['debug'])
         _toggle_widgets(False) # Re-enable widgets
         _set_button_state(w_discover_btn, working=False) # Ensure button state is idle
         w_download_btn.disabled = True # Keep download disabled
@@ -691,6 +802,7 @@ def on_location_selected(change):
     state["devices_at_selected_location"] = {}
     state["chosen_deployments"] = []
     state["available_products"] = {}
+    state["products_by_code"] = {}
     state["available_archive_files"] = []
     state["product_checkboxes"] = {}
     state["archive_checkboxes"] = {}
@@ -700,15 +812,9 @@ def on_location_selected(change):
         _toggle_widgets(False)
         return
 
-    selected_display_string = change['new']
-    try:
-        selected_index = state["parent_loc_choices"].index(selected_display_string)
-        selected_code = state["parent_loc_codes"][selected_index]
-        state["selected_parent_code"] = selected_code
-    except (ValueError, IndexError):
-        show_status(f"✖ Error identifying selected location: {selected_display_string}", target='discover', error=True)
-        _toggle_widgets(False)
-        return
+    # The selector's options are (display_string, parent_code) pairs, so its value is the code itself
+    selected_code = change['new']
+    state["selected_parent_code"] = selected_code
 
     details = state["parent_choice_details"].get(selected_code)
     if not details:
@@ -739,19 +845,20 @@ def on_location_selected(change):
         if len(sorted_device_codes) > 1:
             device_options.append("ALL Hydrophones at this location")
 
-    # Use preloaded device names
-    device_options.extend([
-        f"{state['preloaded_device_names'].get(code, 'Unknown')} ({code})" 
-        for code in sorted_device_codes
-    ])
-    
-    state["devices_at_selected_location"] = {
-        code: state["preloaded_device_names"].get(code, "Unknown Device")
-        for code in sorted_device_codes
-    }
+    # Device names: preloaded (archive mode) or from the first deployment of each device
+    preloaded_names = state["preloaded_device_names"]
+    device_names = {}
+    for dep in details['all_deployments']:
+        d_code = dep.get('deviceCode')
+        if d_code:
+            device_names.setdefault(d_code, preloaded_names.get(d_code) or dep.get('deviceName') or "Unknown Device")
+
+    state["devices_at_selected_location"] = {code: device_names.get(code, "Unknown Device") for code in sorted_device_codes}
+    device_options += [f"{name} ({code})" for code, name in state["devices_at_selected_location"].items()]
 
-    w_device_select.options = device_options
-    w_device_select.disabled = False
+    with w_device_select.hold_sync(): # One front-end update for options + enabled state
+        w_device_select.options = device_options
+        w_device_select.disabled = False
     show_status("Location selected. Select Device(s).", target='discover', working=False)
     _toggle_widgets(False)
 
@@ -765,6 +872,7 @@ def on_device_selected(change):
     w_download_btn.disabled = True
     state["chosen_deployments"] = []
     state["available_products"] = {}
+    state["products_by_code"] = {}
     state["available_archive_files"] = []
     state["product_checkboxes"] = {}
     state["archive_checkboxes"] = {}
@@ -794,12 +902,10 @@ def on_device_selected(change):
         state["chosen_deployments"] = all_parent_deployments
         w_device_select.value = ("ALL Hydrophones at this location",)
     else:
-        chosen_codes = set()
-        for option_str in selected_options:
-            match = re.search(r'\(([^)]+)\)$', option_str)
-            if match:
-                chosen_codes.add(match.group(1))
-        state["chosen_deployments"] = [dep for dep in all_parent_deployments if dep.get('deviceCode') in chosen_codes]
+        chosen_codes = {m.group(1) for m in map(_DEVICE_CODE_RE.search, selected_options) if m}
+        deployments_by_code = details['deployments_by_code']
+        state["chosen_deployments"] = list(chain.from_iterable(
+            deployments_by_code.get(code, ()) for code in sorted(chosen_codes)))
 
     if not state["chosen_deployments"]:
         show_status("✖ No valid deployments found for selected device(s).", target='discover', error=True)
@@ -811,7 +917,7 @@ def on_device_selected(change):
 
     # Fetch Products or List Archive Files
     is_archive = (w_mode.value == 'Request Archived Data')
-    ui_widgets_to_add = []
+    ui_widgets_to_add = ()
 
     try:
         if is_archive:
@@ -828,23 +934,28 @@ def on_device_selected(change):
             state["available_archive_files"] = archive_files_info
             print(f"Found {len(archive_files_info)} archive file entries.", file=sys.stderr)
             ui_widgets_to_add = _build_archive_selection_ui(archive_files_info)
-            w_archive_selection_area.children = tuple(ui_widgets_to_add)
+            w_archive_selection_area.children = ui_widgets_to_add
 
         else:  # Data Product Mode
             show_status("Fetching available data products...", target='discover', working=True)
             print("--- Fetching Data Products ---", file=sys.stderr)
-            prod_opts_raw = onc_service.getDataProducts({"deviceCode": first_device_code})
+            prod_opts_raw = utils.get_data_products(onc_service, first_device_code)
             available_data_products = defaultdict(list)
-            if isinstance(prod_opts_raw, list):
-                for p in prod_opts_raw:
-                    if isinstance(p, dict) and p.get('extension'):
-                        ext = p['extension'].lower()
-                        if ext in settings.SUPPORTED_EXTENSIONS:
-                            available_data_products[ext].append(p)
+            for p in (prod_opts_raw if isinstance(prod_opts_raw, list) else ()):
+                ext = p.get('extension') if isinstance(p, dict) else None
+                if ext:
+                    ext = ext.lower()  # Lowercase once for both the check and the key
+                    if ext in settings.SUPPORTED_EXTENSIONS:
+                        available_data_products[ext].append(p)
             state["available_products"] = available_data_products
+            state["products_by_code"] = {
+                (ext, p['dataProductCode']): p
+                for ext, ext_products in available_data_products.items()
+                for p in ext_products if p.get('dataProductCode')
+            }
             print(f"Found products for extensions: {list(available_data_products.keys())}", file=sys.stderr)
             ui_widgets_to_add = _build_product_selection_ui(available_data_products)
-            w_product_selection_area.children = tuple(ui_widgets_to_add)
+            w_product_selection_area.children = ui_widgets_to_add
 
         if not ui_widgets_to_add:
             show_status("No products/files found to select.", target='discover', error=False)
@@ -869,10 +980,18 @@ def on_download_button_clicked(b):
     w_output_area.clear_output(wait=True)
 
     try:
+        # Snapshot widget values once; everything below works on plain locals
+        is_archive = (w_mode.value == 'Request Archived Data')
+        zip_output = w_zip_output.value
+        force = w_force.value
+        checkboxes = state.get("archive_checkboxes" if is_archive else "product_checkboxes", {})
+        selected_keys = [key for key, cb in checkboxes.items() if cb.value]
+
         # --- Collect Final Parameters from STATE ---
         params = state['all_params'].copy()
         # Add zip output parameter
-        params['zip_output'] = w_zip_output.value
+        params['zip_output'] = zip_output
+        params['force'] = force
         # Get required items from state, validate they exist
         params['onc_service'] = state.get('onc_service')
         params['chosen_deployments'] = state.get('chosen_deployments')
@@ -881,33 +1000,30 @@ def on_download_button_clicked(b):
             show_status("✖ State error: Discovery must complete successfully first.", target='download', error=True)
             _toggle_widgets(False); _set_button_state(w_download_btn, working=False); return
 
-        is_archive = (w_mode.value == 'Request Archived Data')
         params['archive'] = is_archive
         # *** Override 'test' flag for the download step ***
         # If the user clicked the download button, they intend to download,
         # regardless of whether Archive mode was selected initially.
         params['test'] = False  # Force test=False for the actual run/download
 
-        chosen_products_for_run = {}
+        chosen_products_for_run = defaultdict(list)
         if not is_archive:
             # Collect selected data products
-            for (prod_code, ext), cb in state.get("product_checkboxes", {}).items():
-                if cb.value:
-                    product_dict = next((p for p in state["available_products"].get(ext, []) if p.get('dataProductCode') == prod_code), None)
-                    if product_dict:
-                        if ext not in chosen_products_for_run: chosen_products_for_run[ext] = []
-                        chosen_products_for_run[ext].append(product_dict)
-                    else:
-                        show_status(f"✖ Internal Error finding product {prod_code} ({ext})", target='download', error=True)
-                        _toggle_widgets(False); _set_button_state(w_download_btn, working=False); return
+            products_by_code = state.get("products_by_code", {})
+            for prod_code, ext in selected_keys:
+                product_dict = products_by_code.get((ext, prod_code))
+                if not product_dict:
+                    show_status(f"✖ Internal Error finding product {prod_code} ({ext})", target='download', error=True)
+                    _toggle_widgets(False); _set_button_state(w_download_btn, working=False); return
+                chosen_products_for_run[ext].append(product_dict)
         else:
             # Collect selected archive extensions
-            selected_archive_exts = [ext for ext, cb in state.get("archive_checkboxes", {}).items() if cb.value]
-            params['selected_archive_extensions'] = selected_archive_exts
+            selected_archive_exts = set(selected_keys)
+            params['selected_archive_extensions'] = sorted(selected_archive_exts)
             if 'flac' in selected_archive_exts:
                 chosen_products_for_run['flac'] = [{'extension': 'flac', 'dataProductCode': 'ARCHIVE_FLAC'}]
 
-        params['chosen_products'] = chosen_products_for_run
+        params['chosen_products'] = dict(chosen_products_for_run)
 
         # --- Final Validation ---
         if not is_archive and not params['chosen_products']:
@@ -922,13 +1038,18 @@ def on_download_button_clicked(b):
             print("\n--- Starting Download/Processing ---")
             show_status("Processing request...", target='download', working=True)
             logger = logging.getLogger()
-            for handler in logger.handlers[:]:
-                logger.removeHandler(handler)
-                handler.close()
+            # Swap out only the handlers this UI installed; leave any others alone
+            prev_handler = state.get("notebook_log_handler")
+            if prev_handler is not None:
+                logger.removeHandler(prev_handler)
+                prev_handler.close()
+            if _log_handler is not None:
+                logger.removeHandler(_log_handler)  # Its stdout echo would duplicate the output-area logs
             log_level = logging.DEBUG if params['debug'] else logging.INFO
             notebook_handler = core_downloader.OutputWidgetHandler(w_output_area)
             notebook_handler.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
             logger.addHandler(notebook_handler)
+            state["notebook_log_handler"] = notebook_handler
             logger.setLevel(log_level)
 
             # Call run_download_logic - it will use params['archive'] correctly
@@ -966,9 +1087,10 @@ def on_download_target_change(change):
         w_drive_mount_instruct.layout.display = 'block'
         
         # Handle Google Drive selection
-        if FILECHOOSER_AVAILABLE:
+        FileChooser, InvalidPathError = _load_file_chooser()
+        if FileChooser is not None:
             # Check if Drive is mounted before attempting to create FileChooser
-            if COLAB_ENV and os.path.isdir(DRIVE_MYDRIVE_PATH):
+            if COLAB_ENV and _drive_mounted():
                 try:
                     # Create new FileChooser instance if needed
                     if state.get("drive_file_chooser_instance") is None:
@@ -976,8 +1098,10 @@ def on_download_target_change(change):
                         fc.title = '<b>Select Google Drive Destination Folder</b>'
                         fc.show_only_dirs = True
                         state["drive_file_chooser_instance"] = fc
-                    # Show the existing or new instance
-                    w_download_drive_container.children = [state["drive_file_chooser_instance"]]
+                    # Show the existing or new instance (skip the sync if it's already shown)
+                    fc = state["drive_file_chooser_instance"]
+                    if w_download_drive_container.children != (fc,):
+                        w_download_drive_container.children = (fc,)
                 except InvalidPathError:
                     # Handle path validation error
                     error_msg = widgets.HTML(
@@ -1010,17 +1134,21 @@ def on_download_target_change(change):
 # --- Mode Change Observer ---
 def on_mode_change(change):
     """Handles mode changes between Data Product and Archive."""
-    w_product_selection_area.children = []
-    w_archive_selection_area.children = []
-    w_product_archive_label.value = ""
-    if w_location_select.value:
-        w_location_select.value = None  # Trigger reset if location was selected
-    else:
-        # If location wasn't selected, manually clear downstream
-        w_location_select.options = []
-        w_device_select.options = []
-        w_device_select.value = []
-        w_download_btn.disabled = True
+    # Hold frontend syncs so the resets (including the cascade from the location
+    # observer) reach the browser as one update per widget
+    with w_location_select.hold_sync(), w_device_select.hold_sync(), \
+            w_product_selection_area.hold_sync(), w_archive_selection_area.hold_sync():
+        w_product_selection_area.children = ()
+        w_archive_selection_area.children = ()
+        w_product_archive_label.value = ""
+        if w_location_select.value:
+            w_location_select.value = None  # Trigger reset if location was selected
+        else:
+            # If location wasn't selected, manually clear downstream
+            w_location_select.options = []
+            w_device_select.options = []
+            w_device_select.value = ()
+            w_download_btn.disabled = True
     clear_status()
 
 # --- Widget Observation Setup ---
@@ -1084,7 +1212,8 @@ def display_ui():
         w_colab_path,
         w_drive_mount_instruct,
         w_download_drive_container,
-        w_zip_output  # Add zip checkbox
+        w_zip_output,  # Add zip checkbox
+        w_force
     ])
 
     # Combine sections
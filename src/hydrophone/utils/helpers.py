@@ -1,53 +1,69 @@
 # hydro_dl/utils.py
+import json
 import logging
+import math
 import os
 import sys
+import time
 import pathlib
 import pprint
-from datetime import datetime
+import re
+from collections import defaultdict
+from datetime import datetime, tzinfo
+from functools import lru_cache
+from itertools import chain
 from typing import Union, Any, Dict, List, Optional, Set, Tuple
 
+import requests
+
 try:
     from dateutil import parser as dtparse
-    from dateutil.tz import gettz, UTC, tzfile
+    from dateutil.tz import gettz, UTC
 except ImportError:
     sys.exit("ERROR: 'python-dateutil' library not found. Please install it: pip install python-dateutil")
 
-from hydrophone.config.settings import ISO_FMT
+try:
+    from zoneinfo import ZoneInfo  # Python 3.9+
+except ImportError:
+    ZoneInfo = None
+
+from hydrophone.config.settings import ISO_FMT, DATA_PRODUCTS_CACHE_TTL_SECONDS
 from hydrophone.core.onc_client import ONC
 
 # --- Formatting & Display ---
 
+_SIZE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB', 'PB')
+
 def human_size(size_bytes: Union[int, float]) -> str:
     """Convert bytes to human readable string."""
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size_bytes < 1024.0:
-            return f"{size_bytes:3.1f} {unit}"
-        size_bytes /= 1024.0
-    return f"{size_bytes:3.1f} PB"
+    if size_bytes < 1024:
+        return f"{size_bytes:3.1f} B"
+    # Each unit step is 2**10, so the unit index comes straight from log2
+    idx = min(int(math.log2(size_bytes)) // 10, len(_SIZE_UNITS) - 1)
+    return f"{size_bytes / (1 << (idx * 10)):3.1f} {_SIZE_UNITS[idx]}"
 
 def dbg_param(msg: str, obj: Any = None, debug_on: bool = False):
     """Prints debug messages and optional object pprint if debug_on is True."""
+    if not debug_on:
+        return
     try:
-        if debug_on:
-            print(f"\n🟦 DEBUG: {msg}")
-            if obj is not None:
+        print(f"\n🟦 DEBUG: {msg}")
+        if obj is not None:
+            # json's C encoder is much faster than pprint on large ONC responses;
+            # pprint remains for objects json can't take (e.g. non-string dict keys)
+            try:
+                print(json.dumps(obj, indent=2, default=str, ensure_ascii=False))
+            except (TypeError, ValueError):
                 pprint.pprint(obj, indent=2, width=110, sort_dicts=False)
     except Exception as e:
         print(f"🟦 Error in dbg_param function: {e}")
 
 def dbg(msg: str, obj: Any = None, args: Any = None):
     """Prints debug messages and optional object pprint if debug flags are set."""
-    try:
-        debug_on = False
-        if args:
-            try:
-                debug_on = args.debug or args.debug_net
-            except AttributeError:
-                pass # Ignore if args object doesn't have these attributes
-        dbg_param(msg, obj, debug_on)
-    except Exception as e:
-        print(f"🟦 Error in dbg function: {e}")
+    # Missing attributes count as off, so this is the whole cost when debugging is disabled
+    if not (getattr(args, 'debug', False) or getattr(args, 'debug_net', False)):
+        return
+    dbg_param(msg, obj, True)
 
 def list_tree(root: Union[str, pathlib.Path], args: Any):
     """Lists directory contents recursively if debug_net is enabled."""
@@ -55,59 +71,82 @@ def list_tree(root: Union[str, pathlib.Path], args: Any):
         return
     root = pathlib.Path(root)
     print(f"📁 Listing files under {root}:")
-    if not root.exists():
-        print(f"   (Directory {root} does not exist)")
-        return
-    try:
-        has_items = any(root.iterdir())
-        if not has_items:
-            print(f"   (Directory {root} is empty)")
-            return
-
-        file_count = 0
-        dir_count = 0
-        items_listed = False
-        for p in sorted(root.rglob("*")):
-            items_listed = True
+
+    def _sorted_entries(directory) -> list:
+        # Per-directory sort gives the same pre-order listing as a global sort
+        # of the rglob results, without materializing the whole tree
+        with os.scandir(directory) as it:
+            return sorted(it, key=lambda e: e.name)
+
+    def _walk(entries: list, depth: int):
+        indent = "   " * (depth + 1)
+        for entry in entries:
             try:
-                rel_path = p.relative_to(root)
-                depth = len(rel_path.parts) - 1
-                indent = "   " * (depth + 1)
-                if p.is_file():
+                if entry.is_dir(follow_symlinks=False):
+                    print(f"{indent}└─ {entry.name}/")
+                    try:
+                        children = _sorted_entries(entry.path)
+                    except OSError as e:
+                        print(f"{indent}   (Error listing {entry.path}: {e})")
+                        continue
+                    _walk(children, depth + 1)
+                elif entry.is_file():
                     try:
-                        size = p.stat().st_size
-                        print(f"{indent}└─ {p.name} ({human_size(size)})")
-                        file_count += 1
-                    except Exception as stat_e:
-                        print(f"{indent}└─ {p.name} (Error getting size: {stat_e})")
-                elif p.is_dir() and p != root:
-                    print(f"{indent}└─ {p.name}/")
-                    dir_count +=1
+                        # DirEntry caches the stat result
+                        print(f"{indent}└─ {entry.name} ({human_size(entry.stat().st_size)})")
+                    except OSError as stat_e:
+                        print(f"{indent}└─ {entry.name} (Error getting size: {stat_e})")
             except Exception as e:
-                print(f"   (Error processing path {p}: {e})")
+                print(f"   (Error processing path {entry.path}: {e})")
 
-        if not items_listed and has_items:
-            print("   (Directory contains items not shown by rglob('*'))")
-        elif file_count == 0 and dir_count == 0 and items_listed:
-             # This condition might be misleading if only empty dirs exist
-             pass # print("   (No files found by rglob('*'))") # Removed as potentially confusing
-    except Exception as e:
+    # The top-level read doubles as the existence and emptiness check
+    try:
+        entries = _sorted_entries(root)
+    except FileNotFoundError:
+        print(f"   (Directory {root} does not exist)")
+        return
+    except OSError as e:
         print(f"   (Could not list directory {root}: {e})")
+        return
+    if not entries:
+        print(f"   (Directory {root} is empty)")
+        return
+    _walk(entries, 0)
 
 # --- Date & Time ---
 
+@lru_cache(maxsize=64)
+def _iso_aware(dt: datetime) -> str:
+    """ISO 8601 UTC string for an aware datetime; cached since the same window bounds recur."""
+    if dt.tzinfo is UTC:
+        return dt.strftime(ISO_FMT)
+    # Ensure conversion to UTC before formatting
+    return dt.astimezone(UTC).strftime(ISO_FMT)
+
 def iso(dt: datetime) -> str:
     """Converts a datetime object to an ISO 8601 UTC string."""
+    # Naive values are handled outside the cache so every one still gets its warning
     if dt.tzinfo is None or dt.tzinfo.utcoffset(dt) is None:
-        logging.warning(f"Naive datetime {dt}. Assuming local for UTC conversion.")
+        logging.warning("Naive datetime %s. Assuming local for UTC conversion.", dt)
         dt = dt.astimezone() # Convert to local timezone first
-    # Ensure conversion to UTC before formatting
-    return dt.astimezone(UTC).strftime(ISO_FMT)
+    return _iso_aware(dt)
 
-def parse_local(s: str, zone: tzfile) -> datetime:
+def get_zone(tz_str: str) -> Optional[tzinfo]:
+    """tzinfo for an IANA name: stdlib ZoneInfo (cached per name), else dateutil. None if unknown."""
+    if ZoneInfo is not None:
+        try:
+            return ZoneInfo(tz_str)
+        except (KeyError, ValueError, TypeError):  # ZoneInfoNotFoundError is a KeyError; no system tz database
+            pass
+    return gettz(tz_str)
+
+def parse_local(s: str, zone: tzinfo) -> datetime:
     """Parses a string into a timezone-aware datetime object in the specified zone."""
     try:
-        d = dtparse.parse(s)
+        try:
+            d = _fromiso(s.strip())
+        except ValueError:
+            d = dtparse.parse(s)
         if d.tzinfo is None or d.tzinfo.utcoffset(d) is None:
             # If naive, assume it's in the target local zone
             return d.replace(tzinfo=zone)
@@ -120,37 +159,42 @@ def parse_local(s: str, zone: tzfile) -> datetime:
 
 # --- Data Extraction ---
 
+# Size strings such as "1,234.5 MB" (estimatedFileSize); commas are stripped before matching
+_SIZE_STR_RE = re.compile(r'(\d+(?:\.\d*)?|\.\d+)\s*([KMGT]?B)?', re.IGNORECASE)
+_SIZE_UNIT_BYTES = {'B': 1, 'KB': 1 << 10, 'MB': 1 << 20, 'GB': 1 << 30, 'TB': 1 << 40}
+
+# Size keys in priority order, with their multiplier to bytes
+_SIZE_KEYS = (
+    ('downloadSize', 1), # Often present in run result, usually bytes
+    ('fileSize', 1), # Bytes
+    ('uncompressedFileSize', 1), # Bytes
+    ('estimatedFileSize', 1), # Handle string units
+    ('compressedFileSize', 1), # Bytes
+    ('archiveSizeMB', 1048576), # MB
+    ('estimatedFileSizeMB', 1048576), # MB
+    ('expectedSizeMB', 1048576), # MB
+)
+_SIZE_KEY_FACTORS = dict(_SIZE_KEYS)
+
 def extract_bytes_from_response(payload: dict) -> int:
     """Extracts size in bytes from various keys in ONC response."""
     if not isinstance(payload, dict): return 0
 
-    size_keys = [
-        ('downloadSize', 1), # Often present in run result, usually bytes
-        ('fileSize', 1), # Bytes
-        ('uncompressedFileSize', 1), # Bytes
-        ('estimatedFileSize', 1), # Handle string units
-        ('compressedFileSize', 1), # Bytes
-        ('archiveSizeMB', 1024*1024), # MB
-        ('estimatedFileSizeMB', 1024*1024), # MB
-        ('expectedSizeMB', 1024*1024) # MB
-    ]
-
-    for key, factor in size_keys:
-        if key in payload and payload[key] is not None:
+    # Most payloads carry one or two of these keys; only visit those
+    present = payload.keys() & _SIZE_KEY_FACTORS.keys()
+    if not present: return 0
+
+    for key, factor in _SIZE_KEYS:
+        if key in present and payload[key] is not None:
             val = payload[key]
             try:
-                if key == 'estimatedFileSize' and isinstance(val, str):
-                    s = str(val).strip().upper().replace(',', '')
-                    n_str = ''.join(filter(lambda x: x.isdigit() or x == '.', s))
-                    if not n_str: continue
-                    n = float(n_str)
-                    if 'GB' in s: return int(n * 1024 * 1024 * 1024)
-                    elif 'MB' in s: return int(n * 1024 * 1024)
-                    elif 'KB' in s: return int(n * 1024)
-                    elif 'B' in s: return int(n)
-                    else: return int(n * 1024 * 1024) # Assume MB if no unit
-                elif isinstance(val, (int, float)):
+                if isinstance(val, (int, float)): # Numeric is the common case
                     return int(float(val) * factor)
+                elif key == 'estimatedFileSize' and isinstance(val, str):
+                    m = _SIZE_STR_RE.search(val.replace(',', ''))
+                    if not m: continue
+                    unit = (m.group(2) or 'MB').upper() # Assume MB if no unit
+                    return int(float(m.group(1)) * _SIZE_UNIT_BYTES[unit])
             except (ValueError, TypeError):
                 continue
 
@@ -189,10 +233,6 @@ def retry_request(func, *args, max_retries=3, initial_wait=1, **kwargs):
     Raises:
         The last exception encountered if all retries fail
     """
-    import time
-    import logging
-    import requests
-
     for attempt in range(max_retries):
         try:
             return func(*args, **kwargs)
@@ -200,20 +240,51 @@ def retry_request(func, *args, max_retries=3, initial_wait=1, **kwargs):
             if e.response is not None and e.response.status_code == 500:
                 if attempt < max_retries - 1:  # Don't wait after the last attempt
                     wait_time = initial_wait * (2 ** attempt)  # Exponential backoff
-                    logging.warning(f"Got 500 error, retrying in {wait_time}s (attempt {attempt + 1}/{max_retries})...")
+                    retry_after = e.response.headers.get('Retry-After', '')
+                    if retry_after.isdigit():  # Honour a server-requested delay (seconds form)
+                        wait_time = max(wait_time, int(retry_after))
+                    logging.warning("Got 500 error, retrying in %ss (attempt %d/%d)...", wait_time, attempt + 1, max_retries)
                     time.sleep(wait_time)
                     continue
             raise  # Re-raise the exception if it's not a 500 error or we're out of retries
 
+# In-process cache of getDataProducts results: (baseUrl, token, deviceCode) -> (fetched_at, response)
+_DATA_PRODUCTS_CACHE: Dict[Tuple[str, str, str], Tuple[float, Any]] = {}
+
+def get_data_products(onc_client: ONC, device_code: str) -> Any:
+    """
+    Returns onc_client.getDataProducts for a device, memoized for DATA_PRODUCTS_CACHE_TTL_SECONDS.
+
+    The product list for a device rarely changes, so discovery, product selection and
+    the UI (including repeated discoveries with fresh clients) share one response.
+    """
+    key = (onc_client.baseUrl, onc_client.token or "", device_code)
+    cached = _DATA_PRODUCTS_CACHE.get(key)
+    if cached is not None and time.monotonic() - cached[0] < DATA_PRODUCTS_CACHE_TTL_SECONDS:
+        return cached[1]
+    products = onc_client.getDataProducts({"deviceCode": device_code})
+    _DATA_PRODUCTS_CACHE[key] = (time.monotonic(), products)
+    return products
+
+def _fromiso(s: str) -> datetime:
+    """datetime.fromisoformat, also accepting the trailing 'Z' ONC uses. Raises ValueError."""
+    return datetime.fromisoformat(s[:-1] + "+00:00" if s[-1:] == "Z" else s)
+
 def parse_datetime(date_str: str) -> datetime:
-    """Parse datetime string to datetime object."""
-    return dtparse.parse(date_str)
+    """
+    Parse datetime string to datetime object.
+    Well-formed ISO strings (what ONC returns) take the fast fromisoformat path;
+    anything else goes through the lenient dateutil parser.
+    """
+    try:
+        return _fromiso(date_str)
+    except ValueError:
+        return dtparse.parse(date_str)
 
 def ensure_dir(path: Union[str, pathlib.Path]) -> pathlib.Path:
     """Ensure directory exists, create if not."""
     path_obj = pathlib.Path(path)
-    if not path_obj.exists():
-        path_obj.mkdir(parents=True)
+    path_obj.mkdir(parents=True, exist_ok=True)
     return path_obj
 
 def filter_deployments_with_data(
@@ -240,16 +311,13 @@ def filter_deployments_with_data(
     """
     from hydrophone.utils.parallel import check_archive_files_parallel
     
-    # Get unique device codes
-    device_codes = set()
-    device_to_deployments = {}
+    # Group deployments by device; the keys double as the unique device codes
+    device_to_deployments = defaultdict(list)
     for dep in deployments:
         device_code = dep.get('deviceCode')
         if device_code:
-            device_codes.add(device_code)
-            if device_code not in device_to_deployments:
-                device_to_deployments[device_code] = []
             device_to_deployments[device_code].append(dep)
+    device_codes = list(device_to_deployments)
     
     if not device_codes:
         return [], {}
@@ -259,7 +327,7 @@ def filter_deployments_with_data(
         # Use parallel check for archive files
         device_has_data = check_archive_files_parallel(
             onc_client,
-            list(device_codes),
+            device_codes,
             start_utc,
             end_utc,
             max_workers=10,
@@ -270,26 +338,26 @@ def filter_deployments_with_data(
         device_has_data = {}
         for device_code in device_codes:
             try:
-                prod_opts = onc_client.getDataProducts({"deviceCode": device_code})
+                prod_opts = get_data_products(onc_client, device_code)
                 has_products = bool(prod_opts and isinstance(prod_opts, list) and prod_opts)
                 device_has_data[device_code] = has_products
                 if debug and not has_products:
-                    logging.debug(f"No data products found for device {device_code}")
+                    logging.debug("No data products found for device %s", device_code)
             except Exception as e:
                 if debug:
-                    logging.warning(f"Error checking data products for device {device_code}: {e}")
+                    logging.warning("Error checking data products for device %s: %s", device_code, e)
                 device_has_data[device_code] = False
     
     # Filter deployments to only those with data
-    filtered_deployments = []
-    for device_code, has_data in device_has_data.items():
-        if has_data and device_code in device_to_deployments:
-            filtered_deployments.extend(device_to_deployments[device_code])
+    filtered_deployments = list(chain.from_iterable(
+        device_to_deployments.get(device_code, ())
+        for device_code, has_data in device_has_data.items() if has_data
+    ))
     
     if debug:
         total_devices = len(device_codes)
         devices_with_data = sum(1 for has_data in device_has_data.values() if has_data)
-        logging.debug(f"Found {devices_with_data}/{total_devices} devices with available data")
+        logging.debug("Found %d/%d devices with available data", devices_with_data, total_devices)
     
     return filtered_deployments, device_has_data
 
@@ -346,4 +414,4 @@ def organize_downloaded_files(output_path: pathlib.Path, device_code: str = None
             if not dst_path.exists():
                 src_path.rename(dst_path)
         except Exception as e:
-            logging.warning(f"Failed to move {src_path.name} to {dst_path}: {e}")
\ No newline at end of file
+            logging.warning("Failed to move %s to %s: %s", src_path.name, dst_path, e)
\ No newline at end of file
@@ -5,22 +5,32 @@ Parallel processing utilities for the hydrophone data requests project.
 import concurrent.futures
 import logging
 import sys
+import threading
+import time
 from typing import Any, Callable, Dict, List, Optional, Tuple, TypeVar
+from itertools import chain
 from datetime import datetime
 from requests.exceptions import HTTPError
 
+from hydrophone.config.settings import ARCHIVE_LISTING_CACHE_TTL_SECONDS
 from hydrophone.core.onc_client import ONC
 from hydrophone.utils import helpers as utils
 
 T = TypeVar('T')
 
+_PROGRESS_INTERVAL = 0.1  # Minimum seconds between progress line updates
+
+# In-process cache of archive availability: (baseUrl, token, deviceCode, dateFrom, dateTo) -> (checked_at, has_files)
+_ARCHIVE_AVAILABILITY_CACHE: Dict[Tuple[str, str, str, str, str], Tuple[float, bool]] = {}
+
 def parallel_map(
     func: Callable[[Any], T],
     items: List[Any],
     max_workers: int = 10,
     desc: str = "Processing",
     ignore_errors: bool = False,
-    debug: bool = False
+    debug: bool = False,
+    write: Optional[Callable[[str], None]] = None
 ) -> List[T]:
     """
     Generic parallel map function that processes items in parallel and shows progress.
@@ -32,6 +42,7 @@ def parallel_map(
         desc: Description for progress reporting
         ignore_errors: If True, skip items that raise exceptions
         debug: If True, show more detailed error messages
+        write: Where progress text goes (default: sys.stdout)
     
     Returns:
         List of results in the same order as input items
@@ -40,43 +51,47 @@ def parallel_map(
     errors = []
     total = len(items)
     completed = 0
+    if not total:
+        return results
+    # Threads are spawned per submitted task, so never ask for more than there are items
+    max_workers = min(max_workers, total)
+    if write is None:
+        def write(text: str) -> None:
+            sys.stdout.write(text)
+            sys.stdout.flush()
     
+    progress_lock = threading.Lock()
+    last_update = 0.0
+
     def process_with_progress(item):
-        nonlocal completed
+        nonlocal completed, last_update
         try:
-            result = func(item)
-            completed += 1
-            # Use print for progress and sys.stdout.write to ensure \r works
-            sys.stdout.write(f"\r{desc}: {completed}/{total}")
-            sys.stdout.flush()
-            return result
+            return func(item)
         except Exception as e:
             if debug:
-                logging.error(f"Error processing item: {e}")
+                logging.error("Error processing item: %s", e)
             if not ignore_errors:
                 raise
             errors.append((item, e))
             return None
+        finally:
+            with progress_lock:
+                completed += 1
+                # Throttle the \r progress line; always show the final count
+                now = time.monotonic()
+                if completed == total or now - last_update >= _PROGRESS_INTERVAL:
+                    last_update = now
+                    write(f"\r{desc}: {completed}/{total}")
 
     with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
-        future_to_item = {executor.submit(process_with_progress, item): item for item in items}
-        results = []
-        
-        for future in concurrent.futures.as_completed(future_to_item):
-            item = future_to_item[future]
-            try:
-                result = future.result()
-                if result is not None or not ignore_errors:
-                    results.append(result)
-            except Exception as e:
-                if not ignore_errors:
-                    executor.shutdown(wait=False)
-                    raise
-                errors.append((item, e))
+        # executor.map yields in input order, and re-raises the first failure when ignore_errors is off
+        results = [
+            result for result in executor.map(process_with_progress, items)
+            if result is not None or not ignore_errors
+        ]
     
     # Print newline after progress bar
-    sys.stdout.write("\n")
-    sys.stdout.flush()
+    write("\n")
     
     if errors and not ignore_errors:
         error_msgs = [f"{item}: {e}" for item, e in errors]
@@ -88,7 +103,8 @@ def get_deployments_parallel(
     onc_client: ONC,
     hydrophones: List[Dict],
     max_workers: int = 10,
-    debug: bool = False
+    debug: bool = False,
+    write: Optional[Callable[[str], None]] = None
 ) -> List[Dict]:
     """
     Fetch deployments for multiple hydrophones in parallel.
@@ -98,6 +114,7 @@ def get_deployments_parallel(
         hydrophones: List of hydrophone device dictionaries
         max_workers: Maximum number of parallel workers
         debug: If True, show more detailed error messages
+        write: Where progress text goes (default: sys.stdout)
     
     Returns:
         List of all valid deployments found
@@ -110,37 +127,29 @@ def get_deployments_parallel(
         try:
             device_deployments = onc_client.getDeployments({"deviceCode": device_code})
             if not isinstance(device_deployments, list):
-                logging.warning(f"Unexpected response type for {device_code} deployments")
+                logging.warning("Unexpected response type for %s deployments", device_code)
                 return []
             
-            # Add device info to each deployment
-            for dep in device_deployments:
-                if isinstance(dep, dict):
-                    dep.update(device)
-            
-            return device_deployments
+            # Add device info to each deployment (as new dicts, leaving the response untouched)
+            return [{**dep, **device} for dep in device_deployments if isinstance(dep, dict)]
         except HTTPError as http_err:
             if http_err.response is not None and http_err.response.status_code == 404:
                 if debug:
-                    logging.debug(f"No deployments found (404) for device {device_code}")
+                    logging.debug("No deployments found (404) for device %s", device_code)
                 return []
             raise
     
-    all_deployments = []
     deployments_lists = parallel_map(
         fetch_device_deployments,
         hydrophones,
         max_workers=max_workers,
         desc="Fetching deployments",
         ignore_errors=True,
-        debug=debug
+        debug=debug,
+        write=write
     )
     
-    for deployments in deployments_lists:
-        if deployments:
-            all_deployments.extend(deployments)
-    
-    return all_deployments
+    return list(chain.from_iterable(deployments_lists))
 
 def check_archive_files_parallel(
     onc_client: ONC,
@@ -148,7 +157,8 @@ def check_archive_files_parallel(
     start_utc: datetime,
     end_utc: datetime,
     max_workers: int = 10,
-    debug: bool = False
+    debug: bool = False,
+    write: Optional[Callable[[str], None]] = None
 ) -> Dict[str, bool]:
     """
     Check multiple devices for available archive files in parallel.
@@ -160,24 +170,33 @@ def check_archive_files_parallel(
         end_utc: End time in UTC
         max_workers: Maximum number of parallel workers
         debug: If True, show more detailed error messages
+        write: Where progress text goes (default: sys.stdout)
     
     Returns:
         Dictionary mapping device codes to boolean indicating if files exist
     """
+    date_from = utils.iso(start_utc)
+    date_to = utils.iso(end_utc)
+
     def check_device_files(device_code: str) -> Tuple[str, bool]:
+        cache_key = (onc_client.baseUrl, onc_client.token or "", device_code, date_from, date_to)
+        cached = _ARCHIVE_AVAILABILITY_CACHE.get(cache_key)
+        if cached is not None and time.monotonic() - cached[0] < ARCHIVE_LISTING_CACHE_TTL_SECONDS:
+            return device_code, cached[1]
         archive_filters = dict(
             deviceCode=device_code,
-            dateFrom=utils.iso(start_utc),
-            dateTo=utils.iso(end_utc),
+            dateFrom=date_from,
+            dateTo=date_to,
             returnOptions='all'
         )
         try:
             list_result = onc_client.getArchivefile(filters=archive_filters, allPages=True)
             has_files = bool(list_result.get("files", []))
+            _ARCHIVE_AVAILABILITY_CACHE[cache_key] = (time.monotonic(), has_files)
             return device_code, has_files
         except Exception as e:
             if debug:
-                logging.warning(f"Error checking files for device {device_code}: {e}")
+                logging.warning("Error checking files for device %s: %s", device_code, e)
             return device_code, False
     
     results = parallel_map(
@@ -186,7 +205,8 @@ def check_archive_files_parallel(
         max_workers=max_workers,
         desc="Checking devices",
         ignore_errors=True,
-        debug=debug
+        debug=debug,
+        write=write
     )
     
     return dict(results) 
\ No newline at end of file
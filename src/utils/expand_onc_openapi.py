@@ -12,9 +12,15 @@ Pure-Python; only needs:  requests, pyyaml, tiktoken
 
 from __future__ import annotations
 import argparse, json, re, sys, yaml, requests, tiktoken
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from urllib.parse import urljoin, urlparse, parse_qs
 
+try:                                            # libyaml bindings when available
+    from yaml import CSafeLoader as SafeLoader, CSafeDumper as SafeDumper
+except ImportError:
+    from yaml import SafeLoader, SafeDumper
+
 LANDING  = "https://data.oceannetworks.ca/OpenAPI"
 FALLBACK = "https://data.oceannetworks.ca/api/definition"
 
@@ -41,7 +47,7 @@ def fetch(url: str) -> dict:
     r = requests.get(url, timeout=60)
     r.raise_for_status()
     if "yaml" in r.headers.get("content-type", "") or url.lower().endswith(".yaml"):
-        return yaml.safe_load(r.text)
+        return yaml.load(r.text, Loader=SafeLoader)
     return r.json()
 
 
@@ -55,6 +61,15 @@ def bundle(root: dict, base_url: str) -> dict:
     """
     cache: dict[str, dict] = {}
 
+    # prefetch every service-level file concurrently ----------------------
+    comps = root.setdefault("components", {}).setdefault("schemas", {})
+    refs = [r["$ref"] for r in root["paths"].values() if "$ref" in r]
+    refs += [r["$ref"] for r in comps.values() if isinstance(r, dict) and "$ref" in r]
+    srv_urls = list(dict.fromkeys(ref.split("#")[0] for ref in refs))
+    if srv_urls:
+        with ThreadPoolExecutor(max_workers=min(10, len(srv_urls))) as ex:
+            cache.update(zip(srv_urls, ex.map(fetch, srv_urls)))
+
     # helper ---------------------------------------------------------------
     def service_spec(ref_url: str) -> dict:
         srv_url = ref_url.split("#")[0]
@@ -73,7 +88,6 @@ def bundle(root: dict, base_url: str) -> dict:
     root["paths"] = new_paths
 
     # expand component schemas (same bug pattern) --------------------------
-    comps = root.setdefault("components", {}).setdefault("schemas", {})
     for key, ref in list(comps.items()):
         if isinstance(ref, dict) and "$ref" in ref:
             spec = service_spec(ref["$ref"])
@@ -87,13 +101,17 @@ def bundle(root: dict, base_url: str) -> dict:
 def write_chunks(text: str):
     enc = tiktoken.get_encoding("cl100k_base")
     CHUNK_DIR.mkdir(exist_ok=True)
-    buf, idx = [], 0
+    buf, idx, running = [], 0, 0
+    # keep a running per-line token count instead of re-encoding the whole buffer
     for line in text.splitlines(keepends=True):
-        buf.append(line)
-        if len(enc.encode("".join(buf))) > MAX_TOK:
+        tks = len(enc.encode(line))
+        if buf and running + tks > MAX_TOK:
             idx += 1
             (CHUNK_DIR / f"onc_openapi_{idx:02d}.txt").write_text("".join(buf))
             buf.clear()
+            running = 0
+        buf.append(line)
+        running += tks
     if buf:
         idx += 1
         (CHUNK_DIR / f"onc_openapi_{idx:02d}.txt").write_text("".join(buf))
@@ -107,7 +125,7 @@ def main(write_json: bool, split: bool):
     root = fetch(root_url)
     full = bundle(root, root_url)
 
-    OUT_YAML.write_text(yaml.safe_dump(full, sort_keys=False))
+    OUT_YAML.write_text(yaml.dump(full, sort_keys=False, Dumper=SafeDumper))
     print(f"✓ saved {OUT_YAML}  ({OUT_YAML.stat().st_size/1024:.1f} kB)")
 
     if write_json:
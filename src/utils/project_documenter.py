@@ -2,17 +2,25 @@
 """
 project_documenter.py - Utility script to document project structure and file contents
 """
+import codecs
 import os
 import datetime
 
-def is_binary_file(file_path):
-    """Check if a file is binary."""
-    try:
-        with open(file_path, 'tr') as check_file:
-            check_file.readline()
-            return False
-    except UnicodeDecodeError:
-        return True
+PROBE_SIZE = 64 * 1024  # Bytes decoded before committing to read the rest of a file
+
+def read_text_file(file_path):
+    """Return a file's contents as text, or None if it is binary (not valid UTF-8)."""
+    # One open serves both the binary check and the contents; binary files are
+    # rejected on their first block instead of being read in full
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(file_path, 'rb') as source_file:
+        try:
+            head = decoder.decode(source_file.read(PROBE_SIZE))
+            text = head + decoder.decode(source_file.read(), final=True)
+        except UnicodeDecodeError:
+            return None
+    # Match text-mode universal newlines
+    return text.replace('\r\n', '\n').replace('\r', '\n')
 
 def get_project_structure(start_path='.', output_file=None, ignore_dirs=None):
     """
@@ -26,7 +34,24 @@ def get_project_structure(start_path='.', output_file=None, ignore_dirs=None):
     if ignore_dirs is None:
         ignore_dirs = ['.git', '.venv', '__pycache__', 'downloads']
     
-    with open(output_file, 'w', encoding='utf-8') as f:
+    # Walk the tree once: the structure lines and the file list are both kept
+    # in memory, so the contents section doesn't need a second traversal
+    structure_lines = []
+    file_paths = []
+    for root, dirs, files in os.walk(start_path):
+        # Skip ignored directories
+        dirs[:] = [d for d in dirs if d not in ignore_dirs]
+        
+        level = root.replace(start_path, '').count(os.sep)
+        indent = '  ' * level
+        structure_lines.append(f"{indent}{os.path.basename(root)}/\n")
+        
+        sub_indent = '  ' * (level + 1)
+        for file in sorted(files):
+            structure_lines.append(f"{sub_indent}{file}\n")
+            file_paths.append(os.path.join(root, file))
+    
+    with open(output_file, 'w', encoding='utf-8', buffering=1 << 20) as f:
         # Write header
         f.write(f"Project Documentation\n")
         f.write(f"Generated on: {datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
@@ -35,42 +60,27 @@ def get_project_structure(start_path='.', output_file=None, ignore_dirs=None):
         # Document project structure
         f.write("Project Structure:\n")
         f.write("=" * 20 + "\n\n")
-        
-        for root, dirs, files in os.walk(start_path):
-            # Skip ignored directories
-            dirs[:] = [d for d in dirs if d not in ignore_dirs]
-            
-            level = root.replace(start_path, '').count(os.sep)
-            indent = '  ' * level
-            f.write(f"{indent}{os.path.basename(root)}/\n")
-            
-            sub_indent = '  ' * (level + 1)
-            for file in sorted(files):
-                f.write(f"{sub_indent}{file}\n")
+        f.writelines(structure_lines)
         
         f.write("\n\nFile Contents:\n")
         f.write("=" * 20 + "\n\n")
         
         # Document file contents
-        for root, dirs, files in os.walk(start_path):
-            # Skip ignored directories
-            dirs[:] = [d for d in dirs if d not in ignore_dirs]
+        for file_path in file_paths:
+            try:
+                contents = read_text_file(file_path)
+            except Exception as e:
+                f.write(f"\nError reading {file_path}: {str(e)}\n")
+                continue
+            
+            # Skip binary files
+            if contents is None:
+                continue
             
-            for file in sorted(files):
-                file_path = os.path.join(root, file)
-                
-                # Skip binary files
-                if is_binary_file(file_path):
-                    continue
-                
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as source_file:
-                        f.write(f"\nFile: {file_path}\n")
-                        f.write("-" * (len(file_path) + 6) + "\n")
-                        f.write(source_file.read())
-                        f.write("\n\n")
-                except Exception as e:
-                    f.write(f"\nError reading {file_path}: {str(e)}\n")
+            f.write(f"\nFile: {file_path}\n")
+            f.write("-" * (len(file_path) + 6) + "\n")
+            f.write(contents)
+            f.write("\n\n")
 
 def main():
     """Main entry point."""